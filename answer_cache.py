@@ -0,0 +1,132 @@
+import json, re, threading, time
+from collections import OrderedDict
+from vision_cache import VisionCache, make_key
+
+try:
+    import numpy as np
+except ImportError:  # semantic lookup is optional
+    np = None
+
+SEMANTIC = False                 # opt-in: every exact miss costs an embedding call
+EMBED_MODEL = "nomic-embed-text"
+EMBED_KEEP_ALIVE = 0             # unload right away; the residency policy only plans for two models
+SIMILARITY = 0.92
+ANSWER_TTL = 7 * 24 * 3600
+MAX_VECTORS = 1000
+
+
+def normalize(question):
+    q = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(q.split())
+
+
+class AnswerCache:
+    # Second-level cache in front of the reasoning model. Exact hits are keyed by
+    # (image hash, model, normalized question) and persisted; near-duplicate questions
+    # are matched by cosine similarity of Ollama embeddings held in memory. Answers
+    # only depend on these keys for the first question of a conversation, so callers
+    # skip the cache once there is history.
+    def __init__(self, client=None, store=None, embed_model=EMBED_MODEL, threshold=SIMILARITY,
+                 ttl=ANSWER_TTL, max_vectors=MAX_VECTORS, semantic=SEMANTIC, log=print):
+        self.client = client
+        self.store = store or VisionCache(table="answers", max_entries=5000, max_bytes=32 * 1024**2)
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_vectors = max_vectors
+        self.log = log
+        self.semantic = semantic and np is not None and client is not None
+        self.vectors = OrderedDict()   # key -> (scope, vector, timestamp)
+        self.matrices = {}             # scope -> (keys, stacked vectors)
+        self.last_embedding = (None, None)
+        self.lock = threading.Lock()
+
+    def key(self, image_hash, model, question):
+        return make_key(image_hash, model, normalize(question))
+
+    def lookup(self, image_hash, model, question):
+        # Returns (answer, "exact" | "semantic") or None.
+        entry = self.load(self.key(image_hash, model, question))
+        if entry is not None:
+            return entry["answer"], "exact"
+        if not self.semantic:
+            return None
+        vec = self.embed(question)
+        if vec is None:
+            return None
+        match = self.search((image_hash, model), vec)
+        if match is None:
+            return None
+        entry = self.load(match)
+        return (entry["answer"], "semantic") if entry else None
+
+    def put(self, image_hash, model, question, answer):
+        key = self.key(image_hash, model, question)
+        self.store.put(key, json.dumps({"question": question, "answer": answer, "t": time.time()}))
+        if self.semantic:
+            vec = self.embed(question)
+            if vec is not None:
+                self.add_vector(key, (image_hash, model), vec)
+
+    def load(self, key):
+        raw = self.store.get(key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if time.time() - entry["t"] > self.ttl:
+            return None
+        return entry
+
+    def embed(self, text):
+        # lookup() and the put() that follows a miss embed the same question; reuse it.
+        text = normalize(text)
+        if self.last_embedding[0] == text:
+            return self.last_embedding[1]
+        try:
+            data = self.client.post("/api/embeddings", {"model": self.embed_model, "prompt": text,
+                                                       "keep_alive": EMBED_KEEP_ALIVE})
+            vec = np.asarray(data["embedding"], dtype=np.float32)
+        except Exception as e:
+            self.semantic = False
+            self.log(f"Semantic answer cache disabled ({self.embed_model}): {e}")
+            return None
+        norm = np.linalg.norm(vec)
+        vec = vec / norm if norm else None
+        self.last_embedding = (text, vec)
+        return vec
+
+    def add_vector(self, key, scope, vec):
+        with self.lock:
+            self.vectors[key] = (scope, vec, time.time())
+            self.vectors.move_to_end(key)
+            self.matrices.pop(scope, None)
+            while len(self.vectors) > self.max_vectors:
+                _, (old_scope, _, _) = self.vectors.popitem(last=False)
+                self.matrices.pop(old_scope, None)
+
+    def search(self, scope, vec):
+        with self.lock:
+            cached = self.matrices.get(scope)
+            if cached is None:
+                now = time.time()
+                keys = [k for k, (s, _, t) in self.vectors.items() if s == scope and now - t <= self.ttl]
+                if not keys:
+                    return None
+                cached = (keys, np.stack([self.vectors[k][1] for k in keys]))
+                self.matrices[scope] = cached
+            keys, matrix = cached
+            sims = matrix @ vec
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            self.vectors.move_to_end(keys[best])
+            return keys[best]
+
+    def clear(self):
+        with self.lock:
+            self.vectors.clear()
+            self.matrices.clear()
+        self.store.clear()
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,374 @@
+import argparse, asyncio, contextlib, glob, hashlib, json, os, re, sys, tempfile
+from collections import Counter, OrderedDict
+from aiohttp import web, ClientError
+from PIL import Image
+from ollama_client import OllamaClient, OllamaError, OLLAMA_URL
+from inference_engine import InferenceEngine, AsyncOllamaClient
+from model_manager import ModelManager
+from vision_cache import VisionCache, CACHE_DIR
+from image_loader import ImageLoader
+from answer_cache import AnswerCache
+from conversation import Conversation
+from vision_pipeline import VISION_MODEL
+from vision_record import BASE_FIELDS, relevant_fields, render, unpack
+from telemetry import Span
+
+UPLOAD_DIR = os.path.join(CACHE_DIR, "uploads")
+MAX_UPLOAD = 50 * 1024**2
+MAX_UPLOAD_DIR = 2 * 1024**3   # older uploads are evicted least-recently-used past this
+MAX_FIELD = 64 * 1024          # bytes per text form field
+MAX_FIELDS = 16
+MAX_ACTIVE = 1       # one GPU: questions run one at a time
+MAX_WAITING = 8
+MAX_SESSIONS = 100
+DEFAULT_MODEL = "deepseek-r1:8b"
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif", ".webp")
+
+
+class Busy(Exception):
+    pass
+
+
+class Admission:
+    # At most max_active requests use the models at once and at most max_waiting
+    # queue behind them. Anything beyond that is refused straight away with a 503
+    # rather than piling up on the GPU.
+    def __init__(self, max_active=MAX_ACTIVE, max_waiting=MAX_WAITING):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.slots = asyncio.Semaphore(max_active)
+        self.active = 0
+        self.waiting = 0
+
+    def full(self):
+        return self.active >= self.max_active and self.waiting >= self.max_waiting
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self.full():
+            raise Busy()
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.slots.release()
+
+
+class VisionChatServer:
+    # Headless version of the desktop app's ask_ai chain. One engine, one set of
+    # caches and one ModelManager are shared by every client.
+    def __init__(self, url=OLLAMA_URL, max_active=MAX_ACTIVE, max_waiting=MAX_WAITING,
+                 upload_dir=UPLOAD_DIR):
+        self.upload_dir = upload_dir
+        os.makedirs(upload_dir, exist_ok=True)
+        self.ollama = OllamaClient(url)
+        self.models = ModelManager(self.ollama, VISION_MODEL, log=self.log)
+        self.vision_cache = VisionCache()
+        self.image_cache = VisionCache(table="encoded_images", max_entries=200, max_bytes=128 * 1024**2)
+        self.answer_cache = AnswerCache(self.ollama, log=self.log)
+        self.loader = ImageLoader()
+        self.engine = InferenceEngine(AsyncOllamaClient(url), self.vision_cache, self.image_cache,
+                                      self.loader, max_inflight=max_active * 2)
+        self.admission = Admission(max_active, max_waiting)
+        self.sessions = OrderedDict()   # session id -> Conversation
+        self.in_use = Counter()         # upload path -> requests using it; never pruned
+
+    def log(self, text):
+        print(text, file=sys.stderr, flush=True)
+
+    def app(self):
+        app = web.Application(client_max_size=MAX_UPLOAD + 64 * 1024)
+        app.router.add_get("/health", self.health)
+        app.router.add_post("/v1/describe", self.describe)
+        app.router.add_post("/v1/ask", self.ask)
+        app.on_startup.append(self.startup)
+        app.on_cleanup.append(self.cleanup)
+        return app
+
+    async def startup(self, app):
+        await asyncio.to_thread(self.models.set_vram, detect_vram())
+        await asyncio.to_thread(self.models.refresh_sizes)
+
+    async def cleanup(self, app):
+        await self.engine.client.close()
+        self.loader.shutdown()
+        self.vision_cache.close()
+        self.image_cache.close()
+        self.answer_cache.close()
+        self.ollama.close()
+
+    # ---------------- UPLOADS ----------------
+    @contextlib.asynccontextmanager
+    async def upload(self, request):
+        # read_form() with the image held against pruning until the request is done.
+        form, path, digest = await self.read_form(request)
+        try:
+            yield form, path, digest
+        finally:
+            self.release(path)
+
+    def hold(self, path):
+        self.in_use[path] += 1
+
+    def release(self, path):
+        self.in_use[path] -= 1
+        if self.in_use[path] <= 0:
+            del self.in_use[path]
+
+    async def read_form(self, request):
+        # Streams the image part to disk while hashing it. Files are stored by content
+        # hash so repeat uploads hit the vision cache and "image_sha256" can reuse one.
+        # The returned path is held; the caller must release() it.
+        if request.content_type != "multipart/form-data":
+            raise web.HTTPUnsupportedMediaType(text="Send the request as multipart/form-data.")
+        form, path, digest = {}, None, None
+        try:
+            reader = await request.multipart()
+            async for part in reader:
+                if part.name != "image":
+                    if len(form) >= MAX_FIELDS:
+                        raise web.HTTPBadRequest(text=f"At most {MAX_FIELDS} form fields.")
+                    form[part.name] = await read_field(part)
+                    continue
+                if path is not None:
+                    raise web.HTTPBadRequest(text="Send one 'image' per request.")
+                path, digest = await self.save_image(part)
+                self.hold(path)
+            if path is not None:
+                await asyncio.to_thread(self.prune_uploads, set(self.in_use))
+            elif form.get("image_sha256"):
+                digest = form["image_sha256"].lower()
+                if not re.fullmatch(r"[0-9a-f]{64}", digest):
+                    raise web.HTTPBadRequest(text="'image_sha256' must be a hex SHA-256 digest.")
+                found = glob.glob(os.path.join(self.upload_dir, glob.escape(digest) + ".*"))
+                if not found:
+                    raise web.HTTPNotFound(text=f"No uploaded image with sha256 {digest}")
+                path = found[0]
+                self.hold(path)
+                try:
+                    os.utime(path)   # mark as recently used for eviction
+                except FileNotFoundError:
+                    raise web.HTTPNotFound(text=f"No uploaded image with sha256 {digest}")
+            else:
+                raise web.HTTPBadRequest(text="Send an 'image' file or an 'image_sha256' from an earlier upload.")
+        except BaseException:
+            if path is not None and path in self.in_use:
+                self.release(path)
+            raise
+        return form, path, digest
+
+    async def save_image(self, part):
+        ext = os.path.splitext(part.filename or "")[1].lower()
+        if ext not in IMAGE_EXTS:
+            raise web.HTTPUnsupportedMediaType(text=f"Unsupported image type: {ext or 'none'}")
+        sha, size = hashlib.sha256(), 0
+        fd, tmp = tempfile.mkstemp(dir=self.upload_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while chunk := await part.read_chunk(1 << 16):
+                    size += len(chunk)
+                    if size > MAX_UPLOAD:
+                        raise web.HTTPRequestEntityTooLarge(max_size=MAX_UPLOAD, actual_size=size)
+                    sha.update(chunk)
+                    f.write(chunk)
+            if not await asyncio.to_thread(is_image, tmp):
+                raise web.HTTPUnsupportedMediaType(text="The 'image' file is not a readable image.")
+            digest = sha.hexdigest()
+            path = os.path.join(self.upload_dir, digest + ext)
+            os.replace(tmp, path)
+            return path, digest
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def prune_uploads(self, keep):
+        # Drops the least recently used uploads once the folder passes MAX_UPLOAD_DIR.
+        # Files in keep belong to requests still in flight.
+        files = []
+        for entry in os.scandir(self.upload_dir):
+            if entry.is_file() and not entry.name.endswith(".part"):
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= MAX_UPLOAD_DIR:
+                break
+            if path not in keep:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                total -= size
+
+    # ---------------- HANDLERS ----------------
+    async def health(self, request):
+        version = await asyncio.to_thread(self.ollama.version)
+        return web.json_response({"ollama": version, "active": self.admission.active,
+                                  "waiting": self.admission.waiting,
+                                  "residency": self.models.mode()})
+
+    async def describe(self, request):
+        if self.admission.full():
+            return busy()
+        async with self.upload(request) as (form, path, digest):
+            try:
+                async with self.admission.slot():
+                    vision, span = await self.vision(path, digest)
+            except Busy:
+                return busy()
+            except (OllamaError, ClientError) as e:
+                raise web.HTTPBadGateway(text=str(e))
+        return web.json_response({"sha256": digest, "record": unpack(vision), "spans": [span]})
+
+    async def ask(self, request):
+        if self.admission.full():
+            return busy()
+        async with self.upload(request) as (form, path, digest):
+            question = form.get("question", "")
+            if not question:
+                raise web.HTTPBadRequest(text="'question' is required.")
+            model = form.get("model") or DEFAULT_MODEL
+            stream = (form.get("stream", "").lower() in ("1", "true", "yes")
+                      or "text/event-stream" in request.headers.get("Accept", ""))
+            try:
+                async with self.admission.slot():
+                    if not stream:
+                        return web.json_response(await self.answer(question, path, digest, model, form))
+                    return await self.stream_answer(request, question, path, digest, model, form)
+            except Busy:
+                return busy()
+            except (OllamaError, ClientError) as e:
+                raise web.HTTPBadGateway(text=str(e))
+
+    async def stream_answer(self, request, question, path, digest, model, form):
+        # Server-sent events: "thinking" and "token" as they arrive, then "done" with
+        # the same body the non-streaming call returns, or "error". Writes wait for the
+        # socket to drain, so a slow client only holds back its own request.
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream",
+                                           "Cache-Control": "no-cache"})
+        await resp.prepare(request)
+        events = asyncio.Queue()
+        task = asyncio.ensure_future(self.answer(
+            question, path, digest, model, form,
+            on_token=lambda t: events.put_nowait(("token", {"text": t})),
+            on_thinking=lambda t: events.put_nowait(("thinking", {"text": t}))))
+        task.add_done_callback(lambda t: events.put_nowait(None))
+        try:
+            while (event := await events.get()) is not None:
+                await send_event(resp, *event)
+            try:
+                result = task.result()
+            except Exception as e:
+                # Headers are already sent, so every failure has to become an event.
+                await send_event(resp, "error", {"error": str(e) or type(e).__name__})
+            else:
+                await send_event(resp, "done", result)
+        finally:
+            task.cancel()   # no-op when finished; stops generation if the client went away
+        await resp.write_eof()
+        return resp
+
+    # ---------------- PIPELINE ----------------
+    async def vision(self, path, digest):
+        span = Span("vision", VISION_MODEL)
+        vision, span.cached = await self.engine.describe(path, digest, span,
+                                                         **self.models.options(VISION_MODEL))
+        if not span.cached:
+            self.models.after_vision()
+        return vision, span.finish()
+
+    async def answer(self, question, path, digest, model, form, on_token=None, on_thinking=None):
+        if model != self.models.text_model:
+            self.models.select(model)   # same residency policy as the desktop app
+        vision, vision_span = await self.vision(path, digest)
+        result = {"sha256": digest, "model": model}
+        record = unpack(vision)
+        conversation = self.conversation(form.get("session"))
+        conversation.set_image(digest, render(record, BASE_FIELDS))
+        # Follow-ups depend on the session's history, so only first questions are cached.
+        first_turn = conversation.empty()
+        hit = None
+        if first_turn:
+            hit = await asyncio.to_thread(self.answer_cache.lookup, digest, model, question)
+        if hit is not None:
+            answer, kind = hit
+            conversation.record(question, answer)
+            if on_token is not None:
+                on_token(answer)
+            return dict(result, answer=answer, cached=kind, spans=[vision_span])
+
+        messages = conversation.messages(question, render(record, relevant_fields(question)))
+        span = Span("reasoning", model)
+        thinking, answer = await self.engine.chat(model, messages, on_token, on_thinking, span,
+                                                  **self.models.options(model))
+        conversation.record(question, answer)
+        if answer and first_turn:
+            await asyncio.to_thread(self.answer_cache.put, digest, model, question, answer)
+        return dict(result, answer=answer, thinking=thinking, spans=[vision_span, span.finish()])
+
+    def conversation(self, session_id):
+        # Named sessions keep their history between requests; the oldest are dropped.
+        if not session_id:
+            return Conversation()
+        conversation = self.sessions.pop(session_id, None) or Conversation()
+        self.sessions[session_id] = conversation
+        while len(self.sessions) > MAX_SESSIONS:
+            self.sessions.popitem(last=False)
+        return conversation
+
+
+def busy():
+    return web.json_response({"error": "busy, retry later"}, status=503, headers={"Retry-After": "2"})
+
+
+async def send_event(resp, event, data):
+    await resp.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+
+
+async def read_field(part):
+    data = bytearray()
+    while chunk := await part.read_chunk(4096):
+        data += chunk
+        if len(data) > MAX_FIELD:
+            raise web.HTTPRequestEntityTooLarge(max_size=MAX_FIELD, actual_size=len(data))
+    return data.decode(part.get_charset(default="utf-8"), errors="replace").strip()
+
+
+def is_image(path):
+    try:
+        with Image.open(path) as img:
+            img.verify()
+        return True
+    except Exception:
+        return False
+
+
+def detect_vram():
+    try:
+        import pynvml
+        pynvml.nvmlInit()
+        return pynvml.nvmlDeviceGetMemoryInfo(pynvml.nvmlDeviceGetHandleByIndex(0)).total
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve the vision chat pipeline over a local HTTP API.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--url", default=OLLAMA_URL, help="Ollama base URL")
+    ap.add_argument("--max-active", type=int, default=MAX_ACTIVE)
+    ap.add_argument("--max-waiting", type=int, default=MAX_WAITING)
+    args = ap.parse_args(argv)
+
+    server = VisionChatServer(args.url, args.max_active, args.max_waiting)
+    web.run_app(server.app(), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
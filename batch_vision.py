@@ -0,0 +1,134 @@
+import argparse, asyncio, glob, json, os, sys, time
+from ollama_client import OLLAMA_URL
+from inference_engine import InferenceEngine, AsyncOllamaClient
+from vision_cache import VisionCache, hash_file
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif")
+
+
+def find_images(target):
+    if os.path.isdir(target):
+        paths = [os.path.join(target, name) for name in os.listdir(target)]
+    else:
+        paths = glob.glob(target, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTS))
+
+
+def load_questions(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def load_done(output):
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # partial line from an interrupted run
+            if "error" not in rec:
+                done.add((rec["sha256"], rec["model"], rec["question"]))
+    return done
+
+
+class BatchRunner:
+    # Images are processed by `workers` coroutines on one event loop; each pulls the
+    # next path only when it is free, so a huge folder is never queued up front.
+    def __init__(self, client, model, questions, output, workers=2):
+        self.model = model
+        self.questions = questions
+        self.workers = workers
+        self.vision_cache = VisionCache()
+        self.image_cache = VisionCache(table="encoded_images", max_entries=200, max_bytes=128 * 1024**2)
+        self.engine = InferenceEngine(client, self.vision_cache, self.image_cache,
+                                      max_inflight=workers * 2)
+        self.done = load_done(output)
+        self.out = open(output, "a+", encoding="utf-8")
+        if self.out.tell():
+            self.out.seek(self.out.tell() - 1)
+            if self.out.read(1) != "\n":
+                self.out.write("\n")  # terminate a line cut off by an interrupted run
+
+    def write(self, rec):
+        # Only ever called from the loop thread, so lines cannot interleave.
+        self.out.write(json.dumps(rec) + "\n")
+        self.out.flush()
+
+    async def process(self, path):
+        try:
+            digest = await asyncio.to_thread(hash_file, path)
+            todo = [q for q in self.questions if (digest, self.model, q) not in self.done]
+            if not todo:
+                return 0
+            start = time.perf_counter()
+            vision, _ = await self.engine.describe(path, digest, structured=False)
+            vision_s = time.perf_counter() - start
+            for q in todo:
+                rec = {"image": path, "sha256": digest, "model": self.model, "question": q,
+                       "vision": vision}
+                start = time.perf_counter()
+                try:
+                    rec["answer"] = await self.engine.answer(self.model, vision, q)
+                except Exception as e:
+                    rec["error"] = str(e)
+                rec["vision_seconds"] = round(vision_s, 3)
+                rec["seconds"] = round(time.perf_counter() - start, 3)
+                self.write(rec)
+            return len(todo)
+        except Exception as e:
+            self.write({"image": path, "sha256": None, "model": self.model, "question": None,
+                        "error": str(e)})
+            return 0
+
+    async def run(self, paths):
+        remaining = iter(paths)
+
+        async def worker():
+            for path in remaining:
+                await self.process(path)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.workers)))
+        finally:
+            await self.engine.client.close()
+
+    def close(self):
+        self.out.close()
+        self.vision_cache.close()
+        self.image_cache.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Ask questions about a folder of images without the GUI.")
+    ap.add_argument("images", help="directory or glob pattern, e.g. 'photos/**/*.jpg'")
+    ap.add_argument("questions", help="text file with one question per line")
+    ap.add_argument("-o", "--output", default="results.jsonl")
+    ap.add_argument("-m", "--model", default="deepseek-r1:8b")
+    ap.add_argument("-w", "--workers", type=int, default=2)
+    ap.add_argument("--url", default=OLLAMA_URL)
+    args = ap.parse_args(argv)
+
+    paths = find_images(args.images)
+    questions = load_questions(args.questions)
+    if not paths or not questions:
+        print("Nothing to do: no images or no questions found.", file=sys.stderr)
+        return 1
+
+    client = AsyncOllamaClient(args.url, pool_size=args.workers * 2)
+    runner = BatchRunner(client, args.model, questions, args.output, args.workers)
+    print(f"{len(paths)} images x {len(questions)} questions, {len(runner.done)} answers already done")
+    try:
+        asyncio.run(runner.run(paths))
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+        return 130
+    finally:
+        runner.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import json, threading, time, argparse, hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockConfig:
+    def __init__(self, latency=0.05, load_time=0.0, tokens_per_sec=200.0, chunk_tokens=1,
+                 reply_tokens=64, models=("llava:latest", "deepseek-r1:8b", "ministral-3:8b"),
+                 think_tokens=0):
+        self.latency = latency              # seconds before the first token (prompt eval)
+        self.load_time = load_time          # extra delay the first time a model is used
+        self.tokens_per_sec = tokens_per_sec
+        self.chunk_tokens = chunk_tokens    # tokens per streamed NDJSON line
+        self.reply_tokens = reply_tokens
+        self.models = list(models)
+        self.think_tokens = think_tokens    # deepseek-r1 style <think> block before chat replies
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, data):
+        line = json.dumps(data).encode() + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        cfg = self.server.config
+        if self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/api/version":
+            self.send_json({"version": "0.0.0-mock"})
+        elif self.path == "/api/tags":
+            self.send_json({"models": [{"name": m, "size": 5 * 1024**3} for m in cfg.models]})
+        elif self.path == "/api/ps":
+            with self.server.lock:
+                loaded = sorted(self.server.loaded)
+            self.send_json({"models": [{"name": m, "size_vram": 5 * 1024**3} for m in loaded]})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self.server.bytes_received += length
+        with self.server.lock:
+            self.server.calls[self.path] = self.server.calls.get(self.path, 0) + 1
+        if self.path in ("/api/generate", "/api/chat"):
+            self.generate(payload, chat=self.path == "/api/chat")
+        elif self.path == "/api/embeddings":
+            digest = hashlib.sha256(payload.get("prompt", "").encode()).digest()
+            self.send_json({"embedding": [b / 255.0 - 0.5 for b in digest]})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def generate(self, payload, chat):
+        cfg = self.server.config
+        model = payload.get("model", "")
+        start = time.perf_counter()
+        load = 0.0
+        with self.server.lock:
+            if model not in self.server.loaded:
+                self.server.loaded.add(model)
+                load = cfg.load_time
+        time.sleep(load + cfg.latency)
+        prompt_eval = time.perf_counter() - start
+
+        if chat:
+            prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+        else:
+            prompt_chars = len(payload.get("prompt", ""))
+        # An empty generate prompt is a warm-up request: load only, no tokens.
+        n_tokens = 0 if not chat and payload.get("prompt") == "" else cfg.reply_tokens
+        words = ["tok "] * n_tokens
+        if chat and n_tokens and cfg.think_tokens:
+            words = ["<think>"] + ["hmm "] * cfg.think_tokens + ["</think>"] + words
+        stats = {"prompt_eval_count": prompt_chars // 4 + 1, "eval_count": n_tokens}
+
+        def piece(text, done=False):
+            data = {"model": model, "done": done}
+            if chat:
+                data["message"] = {"role": "assistant", "content": text}
+            else:
+                data["response"] = text
+            return data
+
+        gen_start = time.perf_counter()
+        if payload.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            sent = 0
+            while sent < len(words):
+                step = min(cfg.chunk_tokens, len(words) - sent)
+                time.sleep(step / cfg.tokens_per_sec)
+                self.write_chunk(piece("".join(words[sent:sent + step])))
+                sent += step
+            final = piece("", done=True)
+            final.update(stats, total_duration=int((time.perf_counter() - start) * 1e9),
+                         load_duration=int(load * 1e9), prompt_eval_duration=int(prompt_eval * 1e9),
+                         eval_duration=int((time.perf_counter() - gen_start) * 1e9))
+            self.write_chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(len(words) / cfg.tokens_per_sec)
+            data = piece("".join(words), done=True)
+            data.update(stats, total_duration=int((time.perf_counter() - start) * 1e9),
+                        load_duration=int(load * 1e9), prompt_eval_duration=int(prompt_eval * 1e9),
+                        eval_duration=int((time.perf_counter() - gen_start) * 1e9))
+            self.send_json(data)
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), MockOllamaHandler)
+        self.config = config or MockConfig()
+        self.loaded = set()
+        self.lock = threading.Lock()
+        self.bytes_received = 0
+        self.calls = {}   # POST path -> request count
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Stand-in Ollama server for offline testing.")
+    ap.add_argument("--port", type=int, default=11434)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--load-time", type=float, default=0.0)
+    ap.add_argument("--tokens-per-sec", type=float, default=200.0)
+    ap.add_argument("--chunk-tokens", type=int, default=1)
+    ap.add_argument("--reply-tokens", type=int, default=64)
+    ap.add_argument("--think-tokens", type=int, default=0)
+    a = ap.parse_args()
+    server = MockOllamaServer(MockConfig(a.latency, a.load_time, a.tokens_per_sec, a.chunk_tokens,
+                                         a.reply_tokens, think_tokens=a.think_tokens), port=a.port)
+    print(f"Mock Ollama listening on {server.url}")
+    server.serve_forever()
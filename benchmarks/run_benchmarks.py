@@ -0,0 +1,209 @@
+import argparse, asyncio, json, multiprocessing, os, resource, statistics, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from mock_ollama import MockConfig, MockOllamaServer
+from ollama_client import OllamaClient
+from conversation import Conversation
+from image_pipeline import encode_image
+from vision_cache import VisionCache
+
+IMAGE_SIZES = [(640, 480), (1920, 1080), (4032, 3024), (8000, 6000)]
+CONVERSATION_TURNS = [1, 10, 40]
+
+
+def peak_rss_mb():
+    # Peak RSS of this process. Each scenario runs in its own process (see isolated())
+    # so this is that scenario's peak. VmHWM belongs to the address space; ru_maxrss
+    # (KiB on Linux) is the fallback but survives exec, so the parent's peak leaks in.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def report(name, latencies, wall=None, **extra):
+    row = {"scenario": name, "n": len(latencies),
+           "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+           "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+           "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+           "throughput_per_s": round(len(latencies) / wall, 2) if wall else None,
+           "peak_rss_mb": round(peak_rss_mb(), 1), **extra}
+    print(f"{name:<34} p50 {row['p50_ms']:>9.2f} ms  p95 {row['p95_ms']:>9.2f} ms  "
+          f"{(row['throughput_per_s'] or 0):>8.2f}/s  rss {row['peak_rss_mb']:>7.1f} MB")
+    return row
+
+
+def make_images(folder):
+    paths = {}
+    for w, h in IMAGE_SIZES:
+        path = os.path.join(folder, f"bench_{w}x{h}.jpg")
+        img = Image.effect_noise((w, h), 64).convert("RGB")
+        img.save(path, quality=90)
+        paths[(w, h)] = path
+    return paths
+
+
+def timed(fn, repeat):
+    out = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t)
+    return out
+
+
+def isolated(fn, *args):
+    # Runs one scenario in a fresh interpreter and returns its rows.
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def bench_encode(size, path, repeat):
+    w, h = size
+    lat = timed(lambda: encode_image(path), repeat)
+    return [report(f"encode_image {w}x{h}", lat, payload_bytes=len(encode_image(path)),
+                   file_bytes=os.path.getsize(path))]
+
+
+def run_engine(url, fn, **kwargs):
+    # Runs fn(engine) on a fresh engine and event loop; the same path the GUI uses.
+    from inference_engine import InferenceEngine, AsyncOllamaClient
+
+    async def run():
+        engine = InferenceEngine(AsyncOllamaClient(url, pool_size=kwargs.get("max_inflight", 8)),
+                                 **kwargs)
+        try:
+            return await fn(engine)
+        finally:
+            await engine.client.close()
+    return asyncio.run(run())
+
+
+def bench_vision(url, size, path, repeat):
+    # engine.describe with no caches, so every repeat is a full encode + llava call.
+    w, h = size
+
+    async def run(engine):
+        lat = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            await engine.describe(path, structured=True)
+            lat.append(time.perf_counter() - t)
+        return lat
+    return [report(f"engine.describe {w}x{h}", run_engine(url, run))]
+
+
+def bench_conversation(url, path, model, turns, repeat):
+    # engine.ask over a growing conversation; the vision record is cached after the
+    # first turn, as it is in the app. Reports the last turn.
+    async def run(engine):
+        lat, ttft = [], []
+        for _ in range(repeat):
+            convo = Conversation()
+            for i in range(turns):
+                t = time.perf_counter()
+                result = await engine.ask(f"Question {i}: what else is in the image?", path, model,
+                                          conversation=convo)
+            lat.append(time.perf_counter() - t)
+            ttft.append(result["spans"][1]["ttft_seconds"] or 0.0)
+        return lat, ttft
+
+    with tempfile.TemporaryDirectory() as folder:
+        cache = VisionCache(os.path.join(folder, "cache.db"))
+        try:
+            lat, ttft = run_engine(url, run, vision_cache=cache)
+        finally:
+            cache.close()
+    return [report(f"engine.ask @ {turns} turns", lat,
+                   ttft_p50_ms=round(percentile(ttft, 50) * 1000, 2))]
+
+
+def bench_concurrency(url, model, requests, workers):
+    # Latency is timed from submission in both cases, so time spent waiting for a
+    # worker here counts the same as waiting for an engine slot below.
+    client = OllamaClient(url, pool_size=workers)
+    messages = lambda i: [{"role": "user", "content": f"prompt {i}"}]
+    start = time.perf_counter()
+    def one(i):
+        client.chat(model, messages(i))
+        return time.perf_counter() - start
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            lat = list(pool.map(one, range(requests)))
+    finally:
+        client.close()
+    return [report(f"chat x{workers} threads", lat, wall=time.perf_counter() - start)]
+
+
+def bench_engine(url, model, requests, inflight):
+    # Same load as bench_concurrency, but every request is a coroutine on one loop.
+    async def run(engine):
+        start = time.perf_counter()
+
+        async def one(i):
+            await engine.chat(model, [{"role": "user", "content": f"prompt {i}"}], stream=False)
+            return time.perf_counter() - start
+
+        lat = await asyncio.gather(*(one(i) for i in range(requests)))
+        return lat, time.perf_counter() - start
+
+    lat, wall = run_engine(url, run, max_inflight=inflight)
+    return [report(f"engine x{inflight} in flight", lat, wall=wall)]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline benchmarks against a mock Ollama server.")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.02)
+    ap.add_argument("--tokens-per-sec", type=float, default=500.0)
+    ap.add_argument("--chunk-tokens", type=int, default=1)
+    ap.add_argument("--reply-tokens", type=int, default=64)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args(argv)
+
+    config = MockConfig(args.latency, 0.0, args.tokens_per_sec, args.chunk_tokens, args.reply_tokens)
+    server = MockOllamaServer(config).start()
+    model = "ministral-3:8b"
+    requests = args.repeat * args.workers * 2
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            images = make_images(folder)
+            for size, path in images.items():
+                rows += isolated(bench_encode, size, path, args.repeat)
+            for size, path in images.items():
+                rows += isolated(bench_vision, server.url, size, path, args.repeat)
+            for turns in CONVERSATION_TURNS:
+                rows += isolated(bench_conversation, server.url, images[IMAGE_SIZES[0]], model, turns,
+                                 args.repeat)
+        rows += isolated(bench_concurrency, server.url, model, requests, args.workers)
+        rows += isolated(bench_engine, server.url, model, requests, args.workers)
+    finally:
+        server.stop()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
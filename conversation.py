@@ -0,0 +1,80 @@
+import threading
+
+TOKEN_BUDGET = 3072
+MAX_SUMMARY_LINES = 8
+SUMMARY_CHARS = 240
+
+
+class Conversation:
+    # Multi-turn history for /api/chat. The image description sits in a fixed system
+    # message at the front so Ollama can reuse its KV cache for that prefix; older
+    # turns are folded into a short summary once the token budget is exceeded.
+    def __init__(self, token_budget=TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.image_key = None
+            self.system = None
+            self.turns = []
+            self.summary = []
+
+    def set_image(self, image_key, description, count=1):
+        with self.lock:
+            if image_key == self.image_key:
+                return
+            self.image_key = image_key
+            if count > 1:
+                intro = f"Answer questions about these {count} images. Refer to them by number.\n\n"
+            else:
+                intro = "Answer questions about this image.\n\nImage:\n"
+            self.system = {"role": "system", "content": intro + description}
+            self.turns = []
+            self.summary = []
+
+    def empty(self):
+        # True until the first turn for the current image(s) has been recorded.
+        with self.lock:
+            return not self.turns and not self.summary
+
+    def count(self, text):
+        # Rough estimate (~4 chars per token) is enough for budgeting.
+        return len(text) // 4 + 1
+
+    def messages(self, question, context=None):
+        # context is prepended to this turn only and is not kept in the history.
+        if context:
+            question = f"Relevant image details:\n{context}\n\n{question}"
+        with self.lock:
+            self.trim(self.count(question))
+            msgs = [self.system] if self.system else []
+            if self.summary:
+                msgs.append({"role": "system",
+                             "content": "Earlier in this conversation:\n" + "\n".join(self.summary)})
+            for q, a in self.turns:
+                msgs.append({"role": "user", "content": q})
+                msgs.append({"role": "assistant", "content": a})
+            msgs.append({"role": "user", "content": question})
+            return msgs
+
+    def record(self, question, reply):
+        with self.lock:
+            self.turns.append((question, reply))
+
+    def total(self, extra):
+        used = extra
+        if self.system:
+            used += self.count(self.system["content"])
+        used += sum(self.count(line) for line in self.summary)
+        used += sum(self.count(q) + self.count(a) for q, a in self.turns)
+        return used
+
+    def trim(self, extra):
+        while self.turns and self.total(extra) > self.token_budget:
+            q, a = self.turns.pop(0)
+            self.summary.append(f"- Q: {q[:SUMMARY_CHARS // 3]} A: {a[:SUMMARY_CHARS]}")
+            del self.summary[:-MAX_SUMMARY_LINES]
+        while self.summary and self.total(extra) > self.token_budget:
+            self.summary.pop(0)
@@ -1,19 +1,96 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-from PIL import Image
-import base64, requests, subprocess, time, psutil, threading, json, os, datetime
-
-# Try to import NVML, if available
-try:
-    from pynvml import *
-    nvmlInit()
-    GPU_AVAILABLE = True
-except Exception:
-    GPU_AVAILABLE = False
+import subprocess, time, threading, os, datetime, queue
+from concurrent.futures import ThreadPoolExecutor, wait
+from ollama_client import OllamaClient
+from inference_engine import InferenceEngine, AsyncOllamaClient
+from model_manager import ModelManager, full_tag
+from model_router import ModelRouter, CTX_TIERS
+from race import race, RaceStats, RACE_MODELS
+from conversation import Conversation, TOKEN_BUDGET
+from transcript_view import TranscriptView
+from telemetry import Telemetry, Span
+from scheduler import Scheduler, Cancelled
+from image_loader import ImageLoader
+from vision_cache import VisionCache, hash_file, make_key
+from answer_cache import AnswerCache
+from image_set import ImageSet
+from session_store import SessionStore, SESSION_DIR
+import vision_pipeline
+from vision_record import BASE_FIELDS, relevant_fields, render, unpack
+from vision_pipeline import VISION_MODEL
 
 APP_TITLE = "Local Vision AI"
-OLLAMA_URL = "http://localhost:11434"
-GENERATE_URL = OLLAMA_URL + "/api/generate"
+REQUIRED_MODELS = ["llava", "deepseek-r1:8b", "ministral-3:8b"]
+PROBE_DELAYS = [0.25, 0.5, 1, 2, 4, 8, 8]  # ~24 s total before giving up
+SESSION_PAGE = 50
+REPLY_RESERVE = 1024
+STREAM_FLUSH_MS = 50
+LOG_FLUSH_MS = 250
+LOG_ROWS = 60
+
+class LiveBubble:
+    # Collects streamed tokens from a worker thread and flushes them into one
+    # chat bubble on the Tk thread every STREAM_FLUSH_MS. Reasoning tokens go to a
+    # collapsed thinking panel above the answer.
+    def __init__(self, app):
+        self.app = app
+        self.text = ""
+        self.thinking = ""
+        self.box = None
+        self.think_box = None
+        self.pending = []
+        self.pending_think = []
+        self.reset = False
+        self.done = False
+        self.epoch = app.chat_area.epoch
+        self.lock = threading.Lock()
+        app.after(0, self.flush)
+
+    def push(self, token):
+        with self.lock:
+            self.pending.append(token)
+
+    def replace(self, text):
+        # Swap in a different answer (race mode, when another model wins).
+        with self.lock:
+            self.pending = [text]
+            self.reset = True
+
+    def push_thinking(self, token):
+        with self.lock:
+            self.pending_think.append(token)
+
+    def finish(self):
+        with self.lock:
+            self.done = True
+
+    def flush(self):
+        with self.lock:
+            chunk = "".join(self.pending)
+            think = "".join(self.pending_think)
+            self.pending.clear()
+            self.pending_think.clear()
+            reset, self.reset = self.reset, False
+            done = self.done
+        if self.epoch != self.app.chat_area.epoch:
+            return  # chat was cleared; the bubble indexes now belong to other entries
+        if reset:
+            self.text = ""
+        if think:
+            self.thinking += think
+            if self.think_box is None:
+                self.think_box = self.app.chat_area.add_thinking(self.thinking)
+            else:
+                self.app.chat_area.set_text(self.think_box, self.thinking, self.epoch)
+        if chunk:
+            self.text += chunk
+            if self.box is None:
+                self.box = self.app.bubble(self.text, "ai")
+            else:
+                self.app.chat_area.set_text(self.box, self.text, self.epoch)
+        if not done:
+            self.app.after(STREAM_FLUSH_MS, self.flush)
 
 class App(ctk.CTk):
     def __init__(self):
@@ -23,16 +100,35 @@ class App(ctk.CTk):
         ctk.set_appearance_mode("Dark")
         ctk.set_default_color_theme("blue")
 
-        self.img_path = None
-        self.chat_log = []
+        self.images = ImageSet()
+        self.loader = ImageLoader()
+        self.digests = {}
+        self.ollama = OllamaClient()
+        self.models = ModelManager(self.ollama, VISION_MODEL, log=self.log_key_event)
+        self.vision_cache = VisionCache()
+        self.image_cache = VisionCache(table="encoded_images", max_entries=200, max_bytes=128 * 1024**2)
+        self.answer_cache = AnswerCache(self.ollama, log=self.log_key_event)
+        # Model calls run as coroutines on the engine's loop; worker threads only wait.
+        self.engine = InferenceEngine(AsyncOllamaClient(self.ollama.base_url), self.vision_cache,
+                                      self.image_cache, self.loader).start()
+        self.scheduler = Scheduler()
+        self.session = SessionStore()
+        self.session_start = 0   # first session turn shown in the transcript
+        self.conversation = Conversation()
         self.current_gpu_log = {}
         self.gpu_sidebar_visible = True
+        self.telemetry = Telemetry()
+        self.router = ModelRouter(self.telemetry, self.models, log=self.log_key_event)
+        self.race_stats = RaceStats()
+        self.log_rows = []
+        self.log_version = -1
+        self.nvml = None
 
         self.build_ui()
         self.build_gpu_sidebar()
-        if GPU_AVAILABLE:
-            self.update_gpu()
-        self.ensure_ollama()
+        # Everything slow happens off the Tk thread so the window shows immediately.
+        threading.Thread(target=self.init_gpu, daemon=True).start()
+        threading.Thread(target=self.ensure_ollama, daemon=True).start()
 
     # ---------------- UI ----------------
     def build_ui(self):
@@ -42,7 +138,8 @@ class App(ctk.CTk):
         self.model_var = ctk.StringVar(value="deepseek-r1:8b")
         ctk.CTkOptionMenu(self.top,
                            values=["deepseek-r1:8b", "ministral-3:8b"],
-                           variable=self.model_var).pack(side="left", padx=10)
+                           variable=self.model_var,
+                           command=self.models.select).pack(side="left", padx=10)
 
         self.mode = ctk.StringVar(value="Dark")
         ctk.CTkOptionMenu(self.top,
@@ -50,6 +147,16 @@ class App(ctk.CTk):
                            variable=self.mode,
                            command=self.toggle_mode).pack(side="left", padx=10)
 
+        self.stream_var = ctk.BooleanVar(value=True)
+        ctk.CTkSwitch(self.top, text="Stream", variable=self.stream_var).pack(side="left", padx=10)
+
+        self.tiled_var = ctk.BooleanVar(value=False)
+        ctk.CTkSwitch(self.top, text="Tiled (large images)", variable=self.tiled_var,
+                      command=self.toggle_tiled).pack(side="left", padx=10)
+
+        self.race_var = ctk.BooleanVar(value=False)
+        ctk.CTkSwitch(self.top, text="Race models", variable=self.race_var).pack(side="left", padx=10)
+
         self.gpu_status_label = ctk.CTkLabel(self.top, text="GPU: --", text_color="green")
         self.gpu_status_label.pack(side="right", padx=10)
 
@@ -59,10 +166,10 @@ class App(ctk.CTk):
         self.chat_frame = ctk.CTkFrame(self)
         self.chat_frame.pack(fill="both", expand=True, padx=15, pady=(5,0))
 
-        self.chat_area = ctk.CTkScrollableFrame(self.chat_frame, corner_radius=15, height=400)
+        self.chat_area = TranscriptView(self.chat_frame, loader=self.loader, corner_radius=15, height=400)
         self.chat_area.pack(fill="both", expand=True, side="left", padx=(0,10))
 
-        self.entry = ctk.CTkEntry(self, placeholder_text="Ask about the image...")
+        self.entry = ctk.CTkEntry(self, placeholder_text="Ask about the image... (@2, @1 @3 or @all to pick images)")
         self.entry.pack(fill="x", padx=15, pady=5)
         self.entry.bind("<Return>", lambda e: self.send())
 
@@ -70,7 +177,10 @@ class App(ctk.CTk):
         bar.pack(pady=5)
         ctk.CTkButton(bar, text="Upload Image", command=self.upload_image).pack(side="left", padx=6)
         ctk.CTkButton(bar, text="Ask", command=self.send).pack(side="left", padx=6)
+        ctk.CTkButton(bar, text="Stop", fg_color="#a5651f", command=self.stop_requests).pack(side="left", padx=6)
         ctk.CTkButton(bar, text="Clear Chat", command=self.clear_chat).pack(side="left", padx=6)
+        ctk.CTkButton(bar, text="Open Session", command=self.open_session).pack(side="left", padx=6)
+        ctk.CTkButton(bar, text="Load Earlier", command=self.load_earlier).pack(side="left", padx=6)
         ctk.CTkButton(bar, text="Export Logs", command=self.export_logs).pack(side="left", padx=6)
         ctk.CTkButton(bar, text="Quit", fg_color="red", command=self.quit_app).pack(side="left", padx=6)
 
@@ -86,6 +196,7 @@ class App(ctk.CTk):
 
         self.log_frame = ctk.CTkScrollableFrame(self.sidebar)
         self.log_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.after(LOG_FLUSH_MS, self.flush_log)
 
     def toggle_gpu_sidebar(self):
         if self.gpu_sidebar_visible:
@@ -103,148 +214,497 @@ class App(ctk.CTk):
 
     # ---------------- CHAT ----------------
     def bubble(self, text, sender="ai"):
-        bg = "#1f6aa5" if sender == "user" else "#2b2b2b"
-        anchor = "e" if sender == "user" else "w"
-        box = ctk.CTkLabel(self.chat_area, text=text, fg_color=bg,
-                            corner_radius=15, wraplength=620, justify="left")
-        box.pack(anchor=anchor, padx=10, pady=6)
+        return self.chat_area.add(text, sender)
 
     # ---------------- IMAGE ----------------
     def upload_image(self):
         path = filedialog.askopenfilename(filetypes=[("Images","*.png *.jpg *.jpeg *.bmp *.tiff")])
         if path:
-            self.img_path = path
-            self.bubble(f"Image Loaded:\n{path}", "user")
+            item = self.images.add(path, self.vision_key(path))
+            self.bubble(f"Image {item.label} loaded:\n{path}", "user")
             self.show_image_preview(path)
+            self.prefetch_vision(item)
 
     def show_image_preview(self, path):
         try:
-            img = Image.open(path)
-            img.thumbnail((200, 200))
-            photo = ctk.CTkImage(img, size=img.size)
-            label = ctk.CTkLabel(self.chat_area, image=photo, text="")
-            label.image = photo
-            label.pack(anchor="e", padx=10, pady=6)
+            self.chat_area.add_image(path)
         except Exception as e:
             self.bubble(f"Preview Error: {e}", "ai")
 
     # ---------------- SEND ----------------
     def send(self):
-        if not self.img_path:
+        if not len(self.images):
             messagebox.showwarning("No Image","Upload an image first.")
             return
 
         msg = self.entry.get().strip()
         if not msg:
             return
+        try:
+            items, question = self.images.resolve(msg)
+        except KeyError as e:
+            messagebox.showwarning("No Image", f"Not in this session: {e.args[0]}")
+            return
+        if not question:
+            messagebox.showwarning("No Question", "Add a question after the image tags.")
+            return
+
+        try:
+            self.scheduler.submit(self.ask_ai, question, items, self.model_var.get(),
+                                  self.tiled_var.get(), self.race_var.get())
+        except queue.Full:
+            messagebox.showinfo("Busy", "Too many questions are waiting. Stop or wait for a reply.")
+            return
 
         self.entry.delete(0,"end")
         self.bubble(msg, "user")
         self.status_label.configure(text="Thinking...", text_color="orange")
 
-        threading.Thread(target=self.ask_ai, args=(msg,), daemon=True).start()
+    def stop_requests(self):
+        if self.scheduler.stop():
+            self.log_key_event("Requests stopped.")
+            self.status_label.configure(text="Stopped", text_color="yellow")
 
     # ---------------- AI ----------------
-    def ask_ai(self, text):
+    def ask_ai(self, job, text, items, model, tiled=False, race_mode=False):
         self.log_key_event("Question sent to Ollama.")
 
         try:
-            vision = self.call_ollama("llava",
-                                      "Describe objects, text, risks, layout and anomalies.",
-                                      [self.encode_image(self.img_path)])
-            self.log_key_event("Vision analysis complete.")
-
-            model = self.model_var.get()
-            prompt = f"Image:\n{vision}\n\nUser:\n{text}"
-
-            reply = self.call_ollama(model, prompt)
-            self.log_key_event("Ollama response complete.")
-
-            self.chat_log.append({"user": text, "ai": reply, "gpu_log": self.current_gpu_log.copy()})
-            self.bubble(reply,"ai")
-            self.status_label.configure(text="Ready", text_color="yellow")
+            visions, vision_spans = [], []
+            for item in items:
+                wait_start = time.perf_counter()
+                vision, span = self.await_vision(item, job, tiled)
+                visions.append(vision)
+                vision_spans.append(dict(span, waited_seconds=round(time.perf_counter() - wait_start, 4)))
+
+            description, context = self.image_context(items, visions, text, tiled)
+            self.conversation.set_image(tuple(i.key for i in items) + (tiled,), description, len(items))
+            digests = [self.image_digest(i.path) for i in items]
+            digest = digests[0] if len(digests) == 1 else make_key(*digests)
+            paths = [i.path for i in items]
+            where = {"image": paths[0]} if len(paths) == 1 else {"image": paths[0], "images": paths}
+            # Cached answers are keyed by image, model and question only, so they are
+            # only valid for the first question; follow-ups depend on the history.
+            # Entries are keyed by the selected model, not the routed or race winner.
+            selected = model
+            first_turn = self.conversation.empty()
+            hit = self.answer_cache.lookup(digest, selected, text) if first_turn else None
+            if hit is not None:
+                reply, kind = hit
+                job.check()
+                self.after(0, self.bubble, f"{reply}\n\n[cached answer, {kind} match]", "ai")
+                self.conversation.record(text, reply)
+                self.log_key_event(f"Answer served from cache ({kind}).")
+                self.session.append({"user": text, "ai": reply, **where, "model": model,
+                                     "gpu_log": self.current_gpu_log.copy(),
+                                     "spans": vision_spans, "cached": kind})
+                self.set_status("Ready")
+                return
+            racing = race_mode and self.router.fits_together(RACE_MODELS)
+            if race_mode and not racing:
+                self.log_key_event("Race skipped: both models do not fit in free VRAM.")
+            if racing:
+                # Both racers run at the context size fits_together() checked.
+                self.conversation.token_budget = CTX_TIERS[-1] - REPLY_RESERVE
+                messages = self.conversation.messages(text, context)
+                result = self.race_models(messages, job)
+                model, thinking, reply = result["winner"], result["thinking"], result["answer"]
+                reasoning_span = result["span"]
+                extra = {"race": {k: result[k] for k in ("winner", "shown", "rule", "models")}}
+            else:
+                model, route = self.router.route(model)
+                # Leave room for the reply inside a reduced context window.
+                self.conversation.token_budget = min(TOKEN_BUDGET, route.get("num_ctx", 1 << 20) - REPLY_RESERVE)
+                messages = self.conversation.messages(text, context)
+                thinking, reply, reasoning_span = self.reason(model, messages, job, route)
+                extra = {"route": route}
+            job.check()   # stopped (or chat cleared) while the reply finished
+            self.conversation.record(text, reply)
+            if reply and first_turn:
+                self.answer_cache.put(digest, selected, text, reply)
+            self.log_key_event(f"Ollama response complete in {reasoning_span['wall_seconds']:.2f}s.")
+
+            # The thinking trace is kept in the session log only, never in the
+            # conversation, so follow-up prompts stay short.
+            turn = {"user": text, "ai": reply, **where, "model": model,
+                    "gpu_log": self.current_gpu_log.copy(),
+                    "spans": vision_spans + [reasoning_span], **extra}
+            if thinking:
+                turn["thinking"] = thinking
+            self.session.append(turn)
+            self.set_status("Ready")
 
         except Exception as e:
-            self.status_label.configure(text="Error", text_color="red")
-            self.bubble(f"Error: {e}","ai")
+            if job.cancelled.is_set():
+                raise Cancelled() from e
+            self.set_status("Error", "red")
+            self.after(0, self.bubble, f"Error: {e}", "ai")
+
+    def reason(self, model, messages, job, route):
+        # Returns (thinking, answer, span dict).
+        span = Span("reasoning", model)
+        if self.stream_var.get():
+            live = LiveBubble(self)
+            try:
+                thinking, reply = self.stream_chat(model, messages, live.push, span, job, route,
+                                                   live.push_thinking)
+            finally:
+                if job.cancelled.is_set():
+                    live.push(" [stopped]")
+                live.finish()
+        else:
+            thinking, reply = self.call_chat(model, messages, span, route, job)
+            job.check()
+            if thinking:
+                self.after(0, self.chat_area.add_thinking, thinking)
+            self.after(0, self.bubble, reply, "ai")
+        return thinking, reply, span.finish(self.telemetry)
+
+    def race_models(self, messages, job):
+        # Both models answer at once; the first to start answering is streamed in.
+        live = LiveBubble(self)
+        try:
+            result = self.run_engine(race(self.engine, RACE_MODELS, messages,
+                                          lambda m: self.chat_options(m, {"num_ctx": CTX_TIERS[-1]}),
+                                          live.push, live.push_thinking, live.replace,
+                                          telemetry=self.telemetry), job)
+        finally:
+            if job.cancelled.is_set():
+                live.push(" [stopped]")
+            live.finish()
+        self.race_stats.record(result)
+        times = ", ".join(f"{m} {r['outcome']}" + (f" {r['ttfa_seconds']:.2f}s" if r["ttfa_seconds"] else "")
+                          for m, r in result["models"].items())
+        self.log_key_event(f"Race won by {result['winner']} ({times}).")
+        rates = ", ".join(f"{m} {s['win_rate']:.0%} of {s['races']}"
+                          for m, s in self.race_stats.summary().items() if s["races"])
+        self.log_key_event(f"Race win rates: {rates}.")
+        return result
+
+    def image_context(self, items, visions, question, tiled):
+        # Structured records go in compactly: base fields once per image in the system
+        # message, and only the fields this question needs on this turn.
+        base, details = [], []
+        for item, vision in zip(items, visions):
+            head = f"Image {item.label}:\n" if len(items) > 1 else ""
+            if tiled:
+                base.append(head + vision)
+                continue
+            record = unpack(vision)
+            base.append(head + render(record, BASE_FIELDS))
+            extra = render(record, relevant_fields(question))
+            if extra:
+                details.append(head + extra)
+        return "\n\n".join(base), "\n\n".join(details) or None
+
+    def vision_key(self, path):
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def image_digest(self, path):
+        key = self.vision_key(path)
+        digest = self.digests.get(key)
+        if digest is None:
+            digest = self.digests[key] = hash_file(path)
+        return digest
+
+    def prefetch_vision(self, item):
+        # Start the llava pass as soon as an image is uploaded. Passes for images that
+        # have left the set, or for the other tiling mode, are dropped.
+        tiled = self.tiled_var.get()
+        self.scheduler.cancel_vision(keep={i.key + (tiled,) for i in self.images.all()})
+        if tiled in item.descriptions:
+            return
+        self.log_key_event(f"Vision pre-analysis started for image #{item.number}.")
+        fut = self.scheduler.vision(item.key + (tiled,), self.describe_image, item.path, tiled)
+        fut.add_done_callback(lambda f: self.index_description(item, tiled, f))
+
+    def index_description(self, item, tiled, fut):
+        if not fut.cancelled() and fut.exception() is None:
+            self.images.set_description(item.key, tiled, *fut.result())
+
+    def toggle_tiled(self):
+        for item in self.images.all():
+            self.prefetch_vision(item)
+
+    def await_vision(self, item, job, tiled=False):
+        # Answers from the image index when the background pass has finished,
+        # otherwise joins it (or any other in-flight pass) for the same image. The
+        # first turn to use a pass reports its real span; later turns an index hit.
+        vision = item.descriptions.get(tiled)
+        if vision is not None:
+            return vision, self.images.take_span(item.key, tiled) or self.index_span()
+        fut = self.scheduler.vision(item.key + (tiled,), self.describe_image, item.path, tiled)
+        while not wait([fut], timeout=0.2).done:
+            job.check()
+        try:
+            result = fut.result()
+        except Exception as e:
+            self.log_key_event(f"Vision pre-analysis failed, retrying: {e}")
+            result = self.describe_image(item.path, tiled)
+        self.images.set_description(item.key, tiled, *result)
+        return item.descriptions.get(tiled, result[0]), self.images.take_span(item.key, tiled) or self.index_span()
+
+    def index_span(self):
+        span = Span("vision-index", VISION_MODEL)
+        span.cached = True
+        return span.finish()
+
+    def describe_image(self, path, tiled=False):
+        # Returns (description, span dict) so ask_ai can report where the time went.
+        span = Span("vision-tiled" if tiled else "vision", VISION_MODEL)
+        options = self.models.options(VISION_MODEL)
+        if tiled:
+            if options.get("keep_alive") == 0:
+                options["keep_alive"] = "1m"  # don't unload llava between tiles
+            vision, span.cached = vision_pipeline.describe_tiled(
+                self.ollama, path, self.vision_cache, self.image_cache, self.image_digest(path), span,
+                loader=self.loader, **options)
+        else:
+            vision, span.cached = self.engine.submit(self.engine.describe(
+                path, self.image_digest(path), span, **options)).result()
+        if span.cached:
+            self.log_key_event("Vision analysis loaded from cache.")
+            return vision, span.finish()
+        self.log_key_event("Vision analysis complete.")
+        self.models.after_vision()
+        return vision, span.finish(self.telemetry)
 
     # ---------------- OLLAMA ----------------
-    def call_ollama(self, model, prompt, images=None):
-        payload = {"model": model, "prompt": prompt, "stream": False}
-        if images:
-            payload["images"] = images
-        r = requests.post(GENERATE_URL, json=payload, timeout=300)
-        return r.json().get("response","")
+    def call_chat(self, model, messages, span=None, options=None, job=None):
+        # Returns (thinking, answer).
+        return self.run_engine(self.engine.chat(model, messages, span=span, stream=False,
+                                                **self.chat_options(model, options)), job)
+
+    def stream_chat(self, model, messages, on_token, span=None, job=None, options=None,
+                    on_thinking=None):
+        span = span or Span("stream", model)
+        result = self.run_engine(self.engine.chat(model, messages, on_token, on_thinking, span,
+                                                  **self.chat_options(model, options)), job)
+        if span.ttft is not None:
+            self.log_key_event(f"First token after {span.ttft:.2f}s"
+                               + (f", answer after {span.ttfa:.2f}s." if span.ttfa is not None else "."))
+        return result
+
+    def run_engine(self, coro, job=None):
+        # Blocks only the calling worker thread; Stop cancels the coroutine.
+        fut = self.engine.submit(coro)
+        if job is not None:
+            job.attach(fut)
+        return fut.result()
+
+    def chat_options(self, model, options=None):
+        extra = self.models.options(model)
+        if options:
+            extra["options"] = dict(options)
+        return extra
 
     def log_key_event(self, text):
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
         self.append_log(f"[{timestamp}] {text}", key_event=True)
 
     def append_log(self, text, key_event=False):
-        color = "green" if key_event else "white"
-        lbl = ctk.CTkLabel(self.log_frame, text=text, anchor="w",
-                            justify="left", wraplength=280, text_color=color)
-        lbl.pack(fill="x", pady=1, padx=5)
-        self.log_frame.update_idletasks()
+        # Safe from any thread; the sidebar picks it up on its next flush.
+        self.telemetry.event(text, key_event)
+
+    def flush_log(self):
+        events = self.telemetry.events
+        if events.version != self.log_version:
+            self.log_version = events.version
+            recent = self.telemetry.recent_events(LOG_ROWS)
+            while len(self.log_rows) < len(recent):
+                lbl = ctk.CTkLabel(self.log_frame, text="", anchor="w",
+                                    justify="left", wraplength=280)
+                lbl.pack(fill="x", pady=1, padx=5)
+                self.log_rows.append(lbl)
+            for lbl, ev in zip(self.log_rows, recent):
+                lbl.configure(text=ev["text"], text_color="green" if ev["key_event"] else "white")
+            for lbl in self.log_rows[len(recent):]:
+                lbl.configure(text="")
+        self.after(LOG_FLUSH_MS, self.flush_log)
 
     # ---------------- GPU ----------------
+    def init_gpu(self):
+        try:
+            import pynvml
+            pynvml.nvmlInit()
+            self.nvml = pynvml
+        except Exception:
+            self.nvml = None
+        self.after(0, self.update_gpu)
+
     def update_gpu(self):
-        if not GPU_AVAILABLE:
+        nv = self.nvml
+        if nv is None:
             self.gpu_status_label.configure(text="GPU: N/A")
             return
         try:
-            h = nvmlDeviceGetHandleByIndex(0)
-            util = nvmlDeviceGetUtilizationRates(h)
-            mem = nvmlDeviceGetMemoryInfo(h)
-            temp = nvmlDeviceGetTemperature(h, NVML_TEMPERATURE_GPU)
+            h = nv.nvmlDeviceGetHandleByIndex(0)
+            util = nv.nvmlDeviceGetUtilizationRates(h)
+            mem = nv.nvmlDeviceGetMemoryInfo(h)
+            temp = nv.nvmlDeviceGetTemperature(h, nv.NVML_TEMPERATURE_GPU)
             gpu_text = f"GPU: {util.gpu}%  Mem: {mem.used/1024**2:.1f}/{mem.total/1024**2:.1f} MB  Temp: {temp}°C"
             self.gpu_status_label.configure(text=gpu_text, text_color="green")
+            self.models.set_vram(mem.total)
             self.current_gpu_log = {"gpu":util.gpu, "memory_used":mem.used,
                                     "memory_total":mem.total, "temp":temp}
+            self.telemetry.sample(self.current_gpu_log)
         except:
             self.gpu_status_label.configure(text="GPU: N/A")
             self.current_gpu_log = {}
         self.after(1000, self.update_gpu)
 
     # ---------------- OLLAMA MANAGEMENT ----------------
+    def set_status(self, text, color="yellow"):
+        # Safe from worker threads.
+        self.after(0, lambda: self.status_label.configure(text=text, text_color=color))
+
     def ensure_ollama(self):
+        version = self.ollama.version()
+        if version is None:
+            self.set_status("Starting Ollama...")
+            try:
+                subprocess.Popen(["ollama","serve"], shell=True)
+            except OSError as e:
+                self.log_key_event(f"Could not start Ollama: {e}")
+            for delay in PROBE_DELAYS:
+                time.sleep(delay)
+                version = self.ollama.version()
+                if version is not None:
+                    break
+        if version is None:
+            self.set_status("Ollama Not Running", "red")
+            self.log_key_event("Ollama did not respond on /api/version.")
+            return
+        self.set_status("Ollama Ready")
+        self.log_key_event(f"Ollama {version} ready.")
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            pool.submit(self.check_models)
+            pool.submit(self.models.select, self.model_var.get())
+
+    def check_models(self):
+        installed = self.models.refresh_sizes()
+        missing = [m for m in REQUIRED_MODELS if full_tag(m) not in installed]
+        for model in missing:
+            self.log_key_event(f"Model {model} is not installed, pulling in background.")
+            threading.Thread(target=self.pull_model, args=(model,), daemon=True).start()
+
+    def pull_model(self, model):
         try:
-            requests.get(OLLAMA_URL, timeout=1)
-            self.status_label.configure(text="Ollama Ready", text_color="yellow")
-        except:
-            subprocess.Popen(["ollama","serve"], shell=True)
-            time.sleep(5)
-            self.status_label.configure(text="Ollama Started", text_color="yellow")
+            for chunk in self.ollama.stream("/api/pull", {"model": model, "stream": True}):
+                if chunk.get("status") == "success":
+                    self.log_key_event(f"Model {model} pulled.")
+                    self.models.refresh_sizes()
+        except Exception as e:
+            self.log_key_event(f"Pull failed for {model}: {e}")
 
     def kill_ollama(self):
+        import psutil
         for proc in psutil.process_iter(["name"]):
             if proc.info["name"] and "ollama" in proc.info["name"].lower():
                 proc.kill()
 
     # ---------------- UTILS ----------------
-    def encode_image(self, path):
-        with open(path,"rb") as f:
-            return base64.b64encode(f.read()).decode()
-
     def toggle_mode(self, m):
         ctk.set_appearance_mode(m)
 
     # ---------------- CLEAR & EXPORT ----------------
     def clear_chat(self):
-        for w in self.chat_area.winfo_children():
-            w.destroy()
-        self.chat_log.clear()
+        # The finished session stays on disk; new turns go to a fresh one. Running
+        # replies are stopped so they don't land in the new chat.
+        if self.scheduler.stop():
+            self.set_status("Ready")
+        self.chat_area.clear()
+        self.session.close()
+        self.session = SessionStore()
+        self.session_start = 0
+        self.conversation.reset()
+
+    def open_session(self):
+        path = filedialog.askopenfilename(initialdir=SESSION_DIR, filetypes=[("Sessions","*.jsonl")])
+        if not path:
+            return
+        if self.scheduler.stop():
+            self.set_status("Ready")
+        self.chat_area.clear()
+        self.conversation.reset()
+        self.images.clear()
+        self.session.close()
+        self.session = SessionStore(os.path.dirname(path), os.path.basename(path)[:-6])
+        total = len(self.session)
+        for turn in self.show_turns(max(0, total - SESSION_PAGE)):
+            for image in turn.get("images") or [turn.get("image")]:
+                if image and os.path.exists(image):
+                    self.images.add(image, self.vision_key(image))
+        self.log_key_event(f"Session {self.session.session_id} reopened ({total} turns).")
+
+    def load_earlier(self):
+        # Pages the previous SESSION_PAGE turns of this session into the transcript.
+        if not self.session_start:
+            return
+        if self.scheduler.pending():
+            messagebox.showinfo("Busy", "Wait for the current reply before loading earlier turns.")
+            return
+        self.chat_area.clear()
+        self.show_turns(max(0, self.session_start - SESSION_PAGE))
+        self.chat_area.canvas.yview_moveto(0.0)
+
+    def show_turns(self, start):
+        # Renders session turns from start to the end and returns them.
+        self.session_start = start
+        if start:
+            self.bubble(f"{start} earlier turns not shown (press Load Earlier).", "ai")
+        turns = self.session.page(start, len(self.session) - start)
+        for turn in turns:
+            self.bubble(turn["user"], "user")
+            if turn.get("thinking"):
+                self.chat_area.add_thinking(turn["thinking"])
+            self.bubble(turn["ai"], "ai")
+        return turns
 
     def export_logs(self):
         path = filedialog.asksaveasfilename(defaultextension=".json")
         if path:
-            export_data = {"chat": self.chat_log}
-            with open(path,"w") as f:
-                json.dump(export_data, f, indent=2)
-            messagebox.showinfo("Saved","Logs exported")
+            threading.Thread(target=self.write_export, args=(path, self.session), daemon=True).start()
+
+    def write_export(self, path, session):
+        try:
+            session.export(path, self.latency_summary(session.iter_turns()))
+            self.after(0, messagebox.showinfo, "Saved", "Logs exported")
+        except Exception as e:
+            msg = str(e)   # e is unbound once the except block ends
+            self.after(0, messagebox.showerror, "Export Error", msg)
+
+    def latency_summary(self, turns):
+        # Running sums so large sessions are summarised without loading them.
+        fields = {"mean_wall_seconds": "wall_seconds", "mean_load_seconds": "load_duration_s",
+                  "mean_prompt_eval_seconds": "prompt_eval_s", "mean_ttft_seconds": "ttft_seconds",
+                  "mean_tokens_per_sec": "tokens_per_sec"}
+        totals = {}
+        for turn in turns:
+            for span in turn.get("spans", []):
+                if span["cached"]:
+                    continue
+                t = totals.setdefault(span["model"], {"calls": 0, **{f: [0.0, 0] for f in fields}})
+                t["calls"] += 1
+                for name, key in fields.items():
+                    if span.get(key) is not None:
+                        t[name][0] += span[key]
+                        t[name][1] += 1
+        return {model: {name: (round(v[0] / v[1], 3) if v[1] else None) if name in fields else v
+                        for name, v in t.items()}
+                for model, t in sorted(totals.items())}
 
     # ---------------- EXIT ----------------
     def quit_app(self):
+        self.scheduler.shutdown()
+        self.engine.close()
+        self.loader.shutdown()
+        self.vision_cache.close()
+        self.image_cache.close()
+        self.answer_cache.close()
+        self.session.close()
+        self.ollama.close()
         self.kill_ollama()
         self.destroy()
 
@@ -0,0 +1,94 @@
+import os, threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from image_pipeline import MAX_SIDE, load_image
+
+THUMB_SIZE = (200, 200)
+LOADER_BYTES = 96 * 1024**2
+LOADER_WORKERS = 2
+
+
+class Decoded:
+    __slots__ = ("image", "thumb", "nbytes")
+
+    def __init__(self, image, thumb):
+        self.image = image     # model-ready, long side <= max_side
+        self.thumb = thumb     # preview for the chat
+        self.nbytes = size_of(image) + size_of(thumb)
+
+
+def size_of(img):
+    return img.width * img.height * len(img.getbands())
+
+
+class ImageLoader:
+    # Decodes each image once, off the Tk thread, into both the chat thumbnail and
+    # the buffer sent to llava. Results are shared through an LRU bounded by decoded
+    # bytes; concurrent requests for the same file share one decode.
+    def __init__(self, max_bytes=LOADER_BYTES, workers=LOADER_WORKERS, max_side=MAX_SIDE,
+                 thumb_size=THUMB_SIZE):
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+        self.thumb_size = thumb_size
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode")
+        self.entries = OrderedDict()   # (path, mtime_ns, size) -> Decoded
+        self.inflight = {}
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(path):
+        st = os.stat(path)
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def get(self, path):
+        # Cached result or None; never decodes.
+        try:
+            key = self.key(path)
+        except OSError:
+            return None
+        with self.lock:
+            decoded = self.entries.get(key)
+            if decoded is not None:
+                self.entries.move_to_end(key)
+            return decoded
+
+    def load(self, path):
+        # Future resolving to a Decoded.
+        key = self.key(path)
+        with self.lock:
+            decoded = self.entries.get(key)
+            if decoded is not None:
+                self.entries.move_to_end(key)
+                fut = Future()
+                fut.set_result(decoded)
+                return fut
+            fut = self.inflight.get(key)
+            if fut is None:
+                fut = self.inflight[key] = self.pool.submit(self.decode, key)
+            return fut
+
+    def decode(self, key):
+        try:
+            image = load_image(key[0], self.max_side)
+            thumb = image.copy()
+            thumb.thumbnail(self.thumb_size)
+            decoded = Decoded(image, thumb)
+            with self.lock:
+                self.entries[key] = decoded
+                self.bytes += decoded.nbytes
+                while self.bytes > self.max_bytes and len(self.entries) > 1:
+                    _, old = self.entries.popitem(last=False)
+                    self.bytes -= old.nbytes
+            return decoded
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,51 @@
+import base64, io
+from PIL import Image, ImageOps
+from vision_cache import hash_file, make_key
+
+# LLaVA tiles its input at 336 px (2x2 grid at most), so anything larger is wasted payload.
+MAX_SIDE = 672
+JPEG_QUALITY = 85
+
+
+def load_image(path, max_side=MAX_SIDE):
+    # Decodes straight to roughly the target size: draft() lets the JPEG decoder
+    # skip 1/2, 1/4 or 1/8 of the DCT work, so a 50 MP photo never exists in memory.
+    with Image.open(path) as img:
+        if img.format == "JPEG":
+            img.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        img.load()
+        return img
+
+
+def encode_pil(img, quality=JPEG_QUALITY):
+    buf = io.BytesIO()
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img.convert("RGBA").save(buf, format="PNG", optimize=True)
+    else:
+        img.convert("RGB").save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def prepare_image(path, max_side=MAX_SIDE, quality=JPEG_QUALITY):
+    return encode_pil(load_image(path, max_side), quality)
+
+
+def encode_image(path, cache=None, digest=None, max_side=MAX_SIDE, quality=JPEG_QUALITY,
+                 loader=None):
+    # With a loader, the image decoded for the preview is reused instead of read again.
+    key = None
+    if cache is not None:
+        key = make_key(digest or hash_file(path), max_side, quality)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached.decode() if isinstance(cached, bytes) else cached
+    if loader is not None and max_side == loader.max_side:
+        data = encode_pil(loader.load(path).result().image, quality)
+    else:
+        data = prepare_image(path, max_side, quality)
+    encoded = base64.b64encode(data).decode()
+    if cache is not None:
+        cache.put(key, encoded)
+    return encoded
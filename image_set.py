@@ -0,0 +1,104 @@
+import os, re, threading
+from collections import OrderedDict
+
+MAX_IMAGES = 12
+TARGET_RE = re.compile(r"(?<!\w)@(all|\d+)\b", re.IGNORECASE)   # not inside a word like me@1
+
+
+class ImageItem:
+    __slots__ = ("number", "path", "key", "descriptions", "spans")
+
+    def __init__(self, number, path, key):
+        self.number = number
+        self.path = path
+        self.key = key                # (path, mtime_ns, size)
+        self.descriptions = {}        # tiled flag -> description
+        self.spans = {}               # tiled flag -> span of the pass, until a turn reports it
+
+    @property
+    def label(self):
+        return f"#{self.number} {os.path.basename(self.path)}"
+
+
+class ImageSet:
+    # Images uploaded in this session, numbered in upload order. Descriptions are
+    # filled in by the background vision pass so questions can be answered from the
+    # index. Only the newest max_images are kept.
+    def __init__(self, max_images=MAX_IMAGES):
+        self.max_images = max_images
+        self.items = OrderedDict()    # number -> ImageItem
+        self.next_number = 1
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, path, key):
+        # Re-uploading an unchanged file moves it to the end instead of adding a copy.
+        with self.lock:
+            for item in self.items.values():
+                if item.key == key:
+                    self.items.move_to_end(item.number)
+                    return item
+            item = ImageItem(self.next_number, path, key)
+            self.next_number += 1
+            self.items[item.number] = item
+            while len(self.items) > self.max_images:
+                self.items.popitem(last=False)
+            return item
+
+    def latest(self):
+        with self.lock:
+            return next(reversed(self.items.values()), None)
+
+    def all(self):
+        with self.lock:
+            return list(self.items.values())
+
+    def get(self, number):
+        with self.lock:
+            return self.items.get(number)
+
+    def set_description(self, key, tiled, description, span=None):
+        # The first result for an image wins, so a pass reported by both the prefetch
+        # callback and a question that joined it is only kept once.
+        with self.lock:
+            for item in self.items.values():
+                if item.key == key and tiled not in item.descriptions:
+                    item.descriptions[tiled] = description
+                    if span is not None:
+                        item.spans[tiled] = span
+
+    def take_span(self, key, tiled):
+        # The vision span for the first turn that uses this description, then None.
+        with self.lock:
+            for item in self.items.values():
+                if item.key == key:
+                    return item.spans.pop(tiled, None)
+            return None
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.next_number = 1
+
+    def resolve(self, question):
+        # "@2 what is this?" targets image 2, "@1 @3" a subset, "@all" every image;
+        # no tag means the latest upload. Returns (items, question without tags).
+        tags = TARGET_RE.findall(question)
+        text = " ".join(TARGET_RE.sub(" ", question).split())
+        if not tags:
+            latest = self.latest()
+            return ([latest] if latest else []), text
+        if any(t.lower() == "all" for t in tags):
+            return self.all(), text
+        items, missing = [], []
+        for tag in dict.fromkeys(tags):
+            item = self.get(int(tag))
+            if item is None:
+                missing.append(f"#{tag}")
+            else:
+                items.append(item)
+        if missing:
+            raise KeyError(", ".join(missing))
+        return items, text
@@ -0,0 +1,265 @@
+import asyncio, json, threading, time
+from collections import deque
+import aiohttp
+from ollama_client import OLLAMA_URL, OllamaError
+from image_pipeline import encode_image
+from vision_cache import hash_file, make_key
+from vision_pipeline import VISION_MODEL, VISION_PROMPT, build_prompt
+from vision_record import STRUCTURED_PROMPT, BASE_FIELDS, parse_record, pack, unpack, relevant_fields, render
+from conversation import Conversation
+from reasoning_trace import ThinkSplitter, split_reply
+from telemetry import Span
+
+MAX_INFLIGHT = 8
+
+
+class AsyncOllamaClient:
+    # aiohttp counterpart of OllamaClient: one pooled session on the engine's loop,
+    # bounded retries on connection failures, NDJSON streaming.
+    def __init__(self, base_url=OLLAMA_URL, connect_timeout=3.05, read_timeout=300,
+                 retries=2, backoff=0.5, pool_size=8):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout,
+                                             sock_read=read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.session = None   # created on first use, inside the running loop
+        self.timings = deque(maxlen=200)
+
+    def ensure_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=self.timeout, connector=aiohttp.TCPConnector(limit=self.pool_size))
+        return self.session
+
+    async def open(self, method, path, **kwargs):
+        # Returns an open response; the caller must release it.
+        session = self.ensure_session()
+        attempt = 0
+        while True:
+            attempt += 1
+            start = time.perf_counter()
+            try:
+                r = await session.request(method, self.base_url + path, **kwargs)
+            except aiohttp.ClientConnectionError:
+                if attempt > self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+                continue
+            self.timings.append({"method": method, "path": path, "status": r.status,
+                                 "attempts": attempt, "seconds": round(time.perf_counter() - start, 4)})
+            if r.status >= 400:
+                text = await r.text()
+                r.release()
+                try:
+                    msg = json.loads(text).get("error", text)
+                except ValueError:
+                    msg = text
+                raise OllamaError(f"{r.status} {path}: {msg}")
+            return r
+
+    async def get(self, path):
+        r = await self.open("GET", path)
+        async with r:
+            return await r.json(content_type=None)
+
+    async def post(self, path, payload):
+        r = await self.open("POST", path, json=payload)
+        async with r:
+            data = await r.json(content_type=None)
+        if "error" in data:
+            raise OllamaError(data["error"])
+        return data
+
+    async def generate(self, model, prompt, images=None, **extra):
+        payload = {"model": model, "prompt": prompt, "stream": False, **extra}
+        if images:
+            payload["images"] = images
+        return await self.post("/api/generate", payload)
+
+    async def chat(self, model, messages, **extra):
+        return await self.post("/api/chat", {"model": model, "messages": messages, "stream": False, **extra})
+
+    def stream_chat(self, model, messages, **extra):
+        return self.stream("/api/chat", {"model": model, "messages": messages, "stream": True, **extra})
+
+    async def stream(self, path, payload):
+        # Cancelling the consuming task closes the response and frees the connection.
+        r = await self.open("POST", path, json=payload)
+        async with r:
+            async for line in r.content:
+                line = line.strip()
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(chunk["error"])
+                yield chunk
+                if chunk.get("done"):
+                    break
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+
+class InferenceEngine:
+    # The vision -> reasoning chain as coroutines on one event loop, so any number of
+    # in-flight questions share the loop and the HTTP pool instead of a thread each.
+    # Blocking work (SQLite caches, hashing, Pillow) goes to the default executor.
+    # Await the coroutines directly (batch CLI, tests) or start the engine's own
+    # loop thread and use submit() from other threads (the GUI).
+    def __init__(self, client=None, vision_cache=None, image_cache=None, loader=None,
+                 max_inflight=MAX_INFLIGHT):
+        self.client = client or AsyncOllamaClient()
+        self.vision_cache = vision_cache
+        self.image_cache = image_cache
+        self.loader = loader
+        self.max_inflight = max_inflight
+        self.slots = None
+        self.vision_tasks = {}
+        self.loop = None
+        self.thread = None
+
+    # ---------------- LOOP ----------------
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(ready.set)
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, name="inference-engine", daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self
+
+    def submit(self, coro):
+        # From any other thread; returns a concurrent.futures.Future whose cancel()
+        # cancels the coroutine.
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def close(self, timeout=5):
+        if self.thread is None:
+            return
+        try:
+            self.submit(self.client.close()).result(timeout)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+            self.thread = None
+
+    def limit(self):
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.max_inflight)
+        return self.slots
+
+    # ---------------- VISION ----------------
+    async def describe(self, path, digest=None, span=None, structured=True, **extra):
+        # Returns (description, from_cache). Uses the same cache keys as
+        # vision_pipeline, and concurrent callers for one image share a single pass.
+        digest = digest or await asyncio.to_thread(hash_file, path)
+        prompt = STRUCTURED_PROMPT if structured else VISION_PROMPT
+        key = make_key(digest, VISION_MODEL, prompt)
+        if self.vision_cache is not None:
+            cached = await asyncio.to_thread(self.vision_cache.get, key)
+            if cached is not None:
+                return cached, True
+        task = self.vision_tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.run_vision(key, path, digest, prompt, span, extra))
+            self.vision_tasks[key] = task
+            task.add_done_callback(lambda t: self.vision_tasks.pop(key, None))
+        # One caller giving up must not cancel the pass for everyone else.
+        return await asyncio.shield(task), False
+
+    async def run_vision(self, key, path, digest, prompt, span, extra):
+        image = await asyncio.to_thread(encode_image, path, self.image_cache, digest, loader=self.loader)
+        if prompt == STRUCTURED_PROMPT:
+            extra = dict(extra, format="json")
+        async with self.limit():
+            data = await self.client.generate(VISION_MODEL, prompt, [image], **extra)
+        if span is not None:
+            span.set_ollama(data)
+        vision = data.get("response", "")
+        if prompt == STRUCTURED_PROMPT:
+            vision = pack(parse_record(vision))
+        if vision and self.vision_cache is not None:
+            await asyncio.to_thread(self.vision_cache.put, key, vision)
+        return vision
+
+    # ---------------- REASONING ----------------
+    async def chat(self, model, messages, on_token=None, on_thinking=None, span=None,
+                   stream=True, **extra):
+        # Returns (thinking, answer). Callbacks run on the engine loop and must not block.
+        span = span or Span("reasoning", model)
+        async with self.limit():
+            if not stream:
+                data = await self.client.chat(model, messages, **extra)
+                span.set_ollama(data)
+                message = data.get("message", {})
+                splitter = ThinkSplitter()
+                pieces = splitter.feed(message.get("content", "")) + splitter.close()
+                thinking = message.get("thinking") or "".join(p for k, p in pieces if k == "think")
+                return thinking.strip(), "".join(p for k, p in pieces if k == "answer").strip()
+
+            parts = {"think": [], "answer": []}
+            callbacks = {"think": on_thinking, "answer": on_token}
+            splitter = ThinkSplitter()
+
+            def emit(pieces):
+                for kind, piece in pieces:
+                    if kind == "answer" and not parts["answer"]:
+                        span.first_answer()
+                    parts[kind].append(piece)
+                    if callbacks[kind] is not None:
+                        callbacks[kind](piece)
+
+            async for chunk in self.client.stream_chat(model, messages, **extra):
+                message = chunk.get("message", {})
+                token = message.get("content", "")
+                thinking = message.get("thinking")
+                if token or thinking:
+                    span.first_token()
+                if thinking:
+                    emit([("think", thinking)])
+                if token:
+                    emit(splitter.feed(token))
+                if chunk.get("done"):
+                    span.set_ollama(chunk)
+            emit(splitter.close())
+            return "".join(parts["think"]), "".join(parts["answer"])
+
+    async def ask(self, question, path, model, conversation=None, structured=True,
+                  on_token=None, on_thinking=None, telemetry=None, **extra):
+        # One full vision -> reasoning turn for a single image. Pass a Conversation to
+        # keep history across calls; without one every question stands alone.
+        digest = await asyncio.to_thread(hash_file, path)
+        vision_span = Span("vision", VISION_MODEL)
+        vision, vision_span.cached = await self.describe(path, digest, vision_span, structured)
+        context = None
+        if structured:
+            record = unpack(vision)
+            description = render(record, BASE_FIELDS)
+            context = render(record, relevant_fields(question))
+        else:
+            description = vision
+        conversation = conversation or Conversation()
+        conversation.set_image(digest, description)
+        span = Span("reasoning", model)
+        thinking, answer = await self.chat(model, conversation.messages(question, context),
+                                           on_token, on_thinking, span, **extra)
+        conversation.record(question, answer)
+        return {"digest": digest, "vision": vision, "thinking": thinking, "answer": answer,
+                "spans": [vision_span.finish(None if vision_span.cached else telemetry),
+                          span.finish(telemetry)]}
+
+    async def answer(self, model, vision, question, **extra):
+        # Single /api/generate prompt over a free-text description, the format batch
+        # mode writes. Any <think> block is dropped.
+        async with self.limit():
+            data = await self.client.generate(model, build_prompt(vision, question), **extra)
+        return split_reply(data.get("response", ""))[1]
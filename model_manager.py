@@ -0,0 +1,116 @@
+import threading, requests
+from ollama_client import OllamaError
+
+RESIDENT_KEEP_ALIVE = "30m"
+VRAM_HEADROOM = 1.2
+
+
+def full_tag(name):
+    return name if ":" in name else name + ":latest"
+
+
+class ModelManager:
+    # Decides how long Ollama keeps each model loaded and pre-loads models so a
+    # question does not pay the cold-load cost. With enough VRAM the vision and
+    # text models both stay resident; otherwise llava is unloaded right after each
+    # pass and the text model is reloaded in the background while the user types.
+    def __init__(self, client, vision_model, log=print):
+        self.client = client
+        self.vision_model = vision_model
+        self.log = log
+        self.text_model = None
+        self.vram_total = None
+        self.sizes = {}
+        self.resident = {}
+        self.warming = set()
+        self.planner = None   # callable(model) -> Ollama "options" its requests will use
+        self.lock = threading.Lock()
+
+    def set_vram(self, total_bytes):
+        self.vram_total = total_bytes
+
+    def refresh_sizes(self):
+        try:
+            tags = self.client.get("/api/tags", timeout=2)
+            self.sizes = {full_tag(m["name"]): m.get("size", 0) for m in tags.get("models", [])}
+        except (requests.RequestException, OllamaError, ValueError):
+            pass
+        return self.sizes
+
+    def refresh_resident(self):
+        try:
+            ps = self.client.get("/api/ps", timeout=2)
+        except (requests.RequestException, OllamaError, ValueError):
+            return self.resident
+        with self.lock:
+            self.resident = {full_tag(m["name"]): m.get("size_vram", 0) for m in ps.get("models", [])}
+            return dict(self.resident)
+
+    def is_loaded(self, model):
+        with self.lock:
+            return full_tag(model) in self.resident
+
+    def mode(self):
+        if not self.vram_total or not self.text_model:
+            return "default"
+        text = self.sizes.get(full_tag(self.text_model))
+        vision = self.sizes.get(full_tag(self.vision_model))
+        if not text or not vision:
+            return "default"   # /api/tags not answered yet: don't guess at evictions
+        if (text + vision) * VRAM_HEADROOM < self.vram_total:
+            return "resident"
+        return "swap"
+
+    def keep_alive(self, model):
+        mode = self.mode()
+        if mode == "default":
+            return None
+        if mode == "swap" and model == self.vision_model:
+            return 0
+        return RESIDENT_KEEP_ALIVE
+
+    def options(self, model):
+        ka = self.keep_alive(model)
+        return {} if ka is None else {"keep_alive": ka}
+
+    def select(self, model):
+        self.text_model = model
+        threading.Thread(target=self._select, args=(model,), daemon=True).start()
+
+    def _select(self, model):
+        if not self.sizes:
+            self.refresh_sizes()
+        self.warm(model)
+        if self.mode() == "resident":
+            self.warm(self.vision_model)
+
+    def after_vision(self):
+        if self.mode() == "swap" and self.text_model:
+            self.warm(self.text_model)
+
+    def warm(self, model):
+        with self.lock:
+            if model in self.warming:
+                return
+            self.warming.add(model)
+        threading.Thread(target=self._warm, args=(model,), daemon=True).start()
+
+    def _warm(self, model):
+        try:
+            self.refresh_resident()
+            if self.is_loaded(model):
+                return
+            # An empty prompt makes Ollama load the weights without generating. It must
+            # carry the same num_ctx/num_gpu as the real requests or they reload it.
+            payload = {"model": model, "prompt": "", **self.options(model)}
+            planned = self.planner(model) if self.planner else None
+            if planned:
+                payload["options"] = planned
+            self.client.post("/api/generate", payload)
+            self.refresh_resident()
+            self.log(f"Model warmed: {model} ({self.mode()} mode).")
+        except (requests.RequestException, OllamaError, ValueError) as e:
+            self.log(f"Warm-up failed for {model}: {e}")
+        finally:
+            with self.lock:
+                self.warming.discard(model)
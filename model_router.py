@@ -0,0 +1,113 @@
+import time
+from model_manager import full_tag
+
+CTX_TIERS = [8192, 4096, 2048]
+KV_BYTES_PER_TOKEN = 128 * 1024    # fp16 KV cache of an 8B GQA model, ~0.125 MB/token
+LAYERS = 33                        # 8B models: 32 transformer layers + output
+WEIGHT_OVERHEAD = 1.1
+HOT_TEMP = 83                      # °C where consumer cards start to throttle
+SAMPLE_MAX_AGE = 5
+FALLBACKS = {
+    "deepseek-r1:8b": ["ministral-3:8b", "deepseek-r1:1.5b"],
+    "ministral-3:8b": ["ministral-3:3b", "deepseek-r1:1.5b"],
+}
+
+
+class ModelRouter:
+    # Picks the reasoning model and its num_ctx/num_gpu from live NVML readings so a
+    # request never spills weights to the CPU. Without fresh GPU data it leaves the
+    # user's choice alone. Ollama reloads the runner whenever num_ctx or num_gpu
+    # changes, so a loaded model keeps its num_ctx until it no longer fits, and
+    # warm-ups load models with the same options.
+    def __init__(self, telemetry, models, log=print):
+        self.telemetry = telemetry
+        self.models = models
+        self.log = log
+        self.ctx = {}   # model -> num_ctx it was last routed with
+        models.planner = self.plan
+
+    def need(self, model, num_ctx):
+        weights = self.models.sizes.get(full_tag(model), 0) * WEIGHT_OVERHEAD
+        return weights + num_ctx * KV_BYTES_PER_TOKEN
+
+    def available(self, sample):
+        free = sample["memory_total"] - sample["memory_used"]
+        # Every model in /api/ps is counted in memory_used, but Ollama evicts idle
+        # ones (llava right after the vision pass) to load the next, so their VRAM
+        # is reclaimable. The requested model's own share is already its to use.
+        return free + sum(self.models.refresh_resident().values())
+
+    def fresh_sample(self):
+        sample = self.telemetry.latest_sample()
+        if not sample or time.time() - sample.get("t", 0) > SAMPLE_MAX_AGE or not self.models.sizes:
+            return None
+        return sample
+
+    def fits_together(self, models, num_ctx=CTX_TIERS[-1]):
+        # Race mode: can all of these sit in VRAM at once? No telemetry means no.
+        sample = self.fresh_sample()
+        if sample is None or any(full_tag(m) not in self.models.sizes for m in models):
+            return False
+        return sum(self.need(m, num_ctx) for m in models) <= self.available(sample)
+
+    def fit(self, model, free):
+        # Largest num_ctx that fits, but never above the one a loaded model runs with.
+        tiers = CTX_TIERS
+        current = self.ctx.get(model)
+        if current is not None and self.models.is_loaded(model):
+            tiers = [t for t in CTX_TIERS if t <= current]
+        for num_ctx in tiers:
+            if self.need(model, num_ctx) <= free:
+                return num_ctx
+        return None
+
+    def offload(self, model, free):
+        # Nothing fits fully: smallest context, GPU layers capped to what fits.
+        num_ctx = CTX_TIERS[-1]
+        layers = max(0, int(LAYERS * free / self.need(model, num_ctx)))
+        return {"num_ctx": num_ctx, "num_gpu": layers}
+
+    def plan(self, model):
+        # Options a warm-up should load this model with, so the first routed request
+        # doesn't reload it.
+        if model in self.ctx:
+            return {"num_ctx": self.ctx[model]}
+        sample = self.fresh_sample()
+        if sample is None or full_tag(model) not in self.models.sizes:
+            return {}
+        free = self.available(sample)
+        num_ctx = self.fit(model, free)
+        options = {"num_ctx": num_ctx} if num_ctx else self.offload(model, free)
+        self.ctx[model] = options["num_ctx"]
+        return options
+
+    def route(self, requested):
+        sample = self.fresh_sample()
+        if sample is None:
+            return self.decide(requested, {}, "no GPU telemetry, using selected model")
+
+        hot = sample.get("temp", 0) >= HOT_TEMP
+        candidates = [requested] + [m for m in FALLBACKS.get(requested, [])
+                                    if full_tag(m) in self.models.sizes]
+        if hot:
+            # Prefer the smallest installed model while the card is throttling.
+            candidates.sort(key=lambda m: self.models.sizes.get(full_tag(m), 0))
+
+        free = self.available(sample)
+        for model in candidates:
+            num_ctx = self.fit(model, free)
+            if num_ctx is not None:
+                why = "fits" if model == requested else "requested model does not fit"
+                if hot:
+                    why += f", GPU at {sample['temp']}°C"
+                self.ctx[model] = num_ctx
+                return self.decide(model, {"num_ctx": num_ctx}, why)
+
+        options = self.offload(requested, free)
+        self.ctx[requested] = options["num_ctx"]
+        return self.decide(requested, options, f"only {free / 1024**3:.1f} GB free, partial offload")
+
+    def decide(self, model, options, reason):
+        opts = ", ".join(f"{k}={v}" for k, v in options.items()) or "defaults"
+        self.log(f"Route: {model} ({opts}) - {reason}.")
+        return model, options
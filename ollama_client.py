@@ -0,0 +1,107 @@
+import requests, time, json, threading
+from collections import deque
+from requests.adapters import HTTPAdapter
+
+OLLAMA_URL = "http://localhost:11434"
+
+
+class OllamaError(RuntimeError):
+    pass
+
+
+class OllamaClient:
+    # One pooled keep-alive session for all Ollama traffic, with bounded retries on
+    # connection failures and a rolling record of per-request timings.
+    def __init__(self, base_url=OLLAMA_URL, connect_timeout=3.05, read_timeout=300,
+                 retries=2, backoff=0.5, pool_size=8):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.timings = deque(maxlen=200)
+        self.lock = threading.Lock()
+
+    def request(self, method, path, timeout=None, retries=None, **kwargs):
+        url = self.base_url + path
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+        retries = self.retries if retries is None else retries
+        attempt = 0
+        while True:
+            attempt += 1
+            start = time.perf_counter()
+            try:
+                r = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                if attempt > retries:
+                    raise
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+                continue
+            self.record(method, path, r.status_code, attempt, time.perf_counter() - start)
+            if r.status_code >= 400:
+                try:
+                    msg = r.json().get("error", r.text)
+                except ValueError:
+                    msg = r.text
+                r.close()
+                raise OllamaError(f"{r.status_code} {path}: {msg}")
+            return r
+
+    def record(self, method, path, status, attempts, seconds):
+        with self.lock:
+            self.timings.append({"method": method, "path": path, "status": status,
+                                 "attempts": attempts, "seconds": round(seconds, 4)})
+
+    def last_timing(self):
+        with self.lock:
+            return dict(self.timings[-1]) if self.timings else {}
+
+    def get(self, path, timeout=None):
+        return self.request("GET", path, timeout=timeout).json()
+
+    def post(self, path, payload, timeout=None):
+        return self.request("POST", path, json=payload, timeout=timeout).json()
+
+    def version(self, timeout=1):
+        try:
+            r = self.request("GET", "/api/version", timeout=timeout, retries=0)
+            return r.json().get("version", "")
+        except (requests.RequestException, OllamaError, ValueError):
+            return None
+
+    def generate(self, model, prompt, images=None, **extra):
+        payload = {"model": model, "prompt": prompt, "stream": False, **extra}
+        if images:
+            payload["images"] = images
+        data = self.post("/api/generate", payload)
+        if "error" in data:
+            raise OllamaError(data["error"])
+        return data
+
+    def chat(self, model, messages, **extra):
+        data = self.post("/api/chat", {"model": model, "messages": messages, "stream": False, **extra})
+        if "error" in data:
+            raise OllamaError(data["error"])
+        return data
+
+    def stream_chat(self, model, messages, **extra):
+        return self.stream("/api/chat", {"model": model, "messages": messages, "stream": True, **extra})
+
+    def stream(self, path, payload):
+        with self.request("POST", path, json=payload, stream=True) as r:
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(chunk["error"])
+                yield chunk
+                if chunk.get("done"):
+                    break
+
+    def close(self):
+        self.session.close()
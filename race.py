@@ -0,0 +1,133 @@
+import asyncio, json, os, threading
+from vision_cache import CACHE_DIR
+from telemetry import Span
+
+RACE_MODELS = ["deepseek-r1:8b", "ministral-3:8b"]
+RACE_RULE = "first-answer"    # or "first-complete"
+MIN_ANSWER_CHARS = 20
+RACE_STATS = os.path.join(CACHE_DIR, "race_stats.json")
+
+
+async def race(engine, models, messages, options=None, on_token=None, on_thinking=None,
+               on_replace=None, rule=RACE_RULE, min_chars=MIN_ANSWER_CHARS, telemetry=None):
+    # Sends the same messages to every model at once. The first model to start its
+    # answer (after any <think> block) is shown. Then, by rule:
+    #   first-answer:   the others are cancelled right away (latency wins);
+    #   first-complete: the others keep going and the first to finish with at least
+    #                   min_chars wins (quality wins); if that is not the model being
+    #                   shown, on_replace gets the winning answer.
+    options = options or (lambda model: {})
+    state = {m: {"think": [], "answer": [], "span": Span("race", m)} for m in models}
+    tasks = {}
+    leader = None
+
+    def relay(model, kind):
+        def callback(text):
+            nonlocal leader
+            state[model][kind].append(text)
+            if leader is None and kind == "answer":
+                leader = model
+                if on_thinking is not None and state[model]["think"]:
+                    on_thinking("".join(state[model]["think"]))
+                if on_token is not None:
+                    on_token("".join(state[model]["answer"]))
+                if rule == "first-answer":
+                    for other, task in tasks.items():
+                        if other != model:
+                            task.cancel()
+            elif model == leader:
+                out = on_token if kind == "answer" else on_thinking
+                if out is not None:
+                    out(text)
+        return callback
+
+    for m in models:
+        tasks[m] = asyncio.ensure_future(engine.chat(
+            m, messages, relay(m, "answer"), relay(m, "think"), state[m]["span"], **options(m)))
+    by_task = {task: m for m, task in tasks.items()}
+
+    winner, results, errors = None, {}, {}
+    pending = set(tasks.values())
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                model = by_task[task]
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    errors[model] = task.exception()
+                    continue
+                results[model] = task.result()
+                answer = results[model][1].strip()
+                if winner is None and answer and (
+                        model == leader if rule == "first-answer" else len(answer) >= min_chars):
+                    winner = model
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+    if winner is None:
+        # Nobody met the rule: fall back to the longest answer that did come back.
+        answered = [m for m in results if results[m][1].strip()]
+        if not answered:
+            if errors:
+                raise next(iter(errors.values()))
+            raise RuntimeError("No model produced an answer.")
+        winner = max(answered, key=lambda m: len(results[m][1]))
+    thinking, answer = results[winner]
+    if winner != leader and on_replace is not None:
+        on_replace(answer)
+
+    report = {}
+    for m in models:
+        span = state[m]["span"].finish(telemetry)
+        outcome = ("won" if m == winner else "error" if m in errors
+                   else "finished" if m in results else "cancelled")
+        report[m] = {"outcome": outcome, "ttft_seconds": span["ttft_seconds"],
+                     "ttfa_seconds": span["ttfa_seconds"], "wall_seconds": span["wall_seconds"],
+                     "answer_chars": len("".join(state[m]["answer"]))}
+        if m in errors:
+            report[m]["error"] = str(errors[m])
+        state[m]["span"] = span
+    return {"winner": winner, "shown": leader, "rule": rule, "thinking": thinking, "answer": answer,
+            "models": report, "span": state[winner]["span"]}
+
+
+class RaceStats:
+    # Running per-model totals across races, kept in a small JSON file so the default
+    # model can be picked from how races actually went.
+    def __init__(self, path=RACE_STATS):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.models = json.load(f)
+        except (OSError, ValueError):
+            self.models = {}
+
+    def record(self, result):
+        with self.lock:
+            for model, r in result["models"].items():
+                s = self.models.setdefault(model, {"races": 0, "wins": 0, "cancelled": 0, "errors": 0,
+                                                   "ttfa_sum": 0.0, "ttfa_n": 0})
+                s["races"] += 1
+                s["wins"] += r["outcome"] == "won"
+                s["cancelled"] += r["outcome"] == "cancelled"
+                s["errors"] += r["outcome"] == "error"
+                if r["ttfa_seconds"] is not None:
+                    s["ttfa_sum"] += r["ttfa_seconds"]
+                    s["ttfa_n"] += 1
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.models, f, indent=2)
+            os.replace(tmp, self.path)
+
+    def summary(self):
+        with self.lock:
+            return {m: {"races": s["races"],
+                        "win_rate": round(s["wins"] / s["races"], 3) if s["races"] else None,
+                        "mean_ttfa_seconds": round(s["ttfa_sum"] / s["ttfa_n"], 3) if s["ttfa_n"] else None,
+                        "cancelled": s["cancelled"], "errors": s["errors"]}
+                    for m, s in sorted(self.models.items())}
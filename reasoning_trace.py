@@ -0,0 +1,74 @@
+OPEN, CLOSE = "<think>", "</think>"
+
+
+class ThinkSplitter:
+    # Splits a streamed reply into ("think", text) and ("answer", text) pieces as
+    # tokens arrive. Tags may be cut across chunks, so a possible partial tag at the
+    # end of a chunk is held back until the next one.
+    def __init__(self):
+        self.state = "start"   # start -> think -> gap -> answer, or start -> answer
+        self.buf = ""
+
+    def feed(self, token):
+        self.buf += token
+        out = []
+        while self.buf:
+            if self.state == "start":
+                head = self.buf.lstrip()
+                if head.startswith(OPEN):
+                    self.buf = head[len(OPEN):]
+                    self.state = "think"
+                elif OPEN.startswith(head):
+                    break   # could still become <think>
+                else:
+                    self.state = "answer"
+            elif self.state == "think":
+                end = self.buf.find(CLOSE)
+                if end >= 0:
+                    self.emit(out, "think", self.buf[:end])
+                    self.buf = self.buf[end + len(CLOSE):]
+                    self.state = "gap"
+                    continue
+                keep = partial_tag(self.buf, CLOSE)
+                self.emit(out, "think", self.buf[:len(self.buf) - keep])
+                self.buf = self.buf[len(self.buf) - keep:]
+                break
+            elif self.state == "gap":
+                # Drop the blank lines between </think> and the answer.
+                self.buf = self.buf.lstrip()
+                if self.buf:
+                    self.state = "answer"
+            else:
+                self.emit(out, "answer", self.buf)
+                self.buf = ""
+        return out
+
+    def close(self):
+        # Whatever is left was not a tag after all.
+        out = []
+        if self.buf:
+            self.emit(out, "answer" if self.state != "think" else "think", self.buf)
+            self.buf = ""
+        return out
+
+    @staticmethod
+    def emit(out, kind, text):
+        if text:
+            out.append((kind, text))
+
+
+def partial_tag(text, tag):
+    # Length of the longest suffix of text that is a prefix of tag.
+    for n in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:n]):
+            return n
+    return 0
+
+
+def split_reply(text):
+    # Non-streaming form: returns (thinking, answer).
+    splitter = ThinkSplitter()
+    parts = {"think": [], "answer": []}
+    for kind, piece in splitter.feed(text) + splitter.close():
+        parts[kind].append(piece)
+    return "".join(parts["think"]).strip(), "".join(parts["answer"]).strip()
@@ -0,0 +1,127 @@
+import threading, queue
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_PENDING = 3
+
+
+class Cancelled(Exception):
+    pass
+
+
+def release(resource):
+    close = getattr(resource, "close", None)
+    (close or resource.cancel)()
+
+
+class Job:
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.cancelled = threading.Event()
+        self.resources = []
+        self.lock = threading.Lock()
+
+    def attach(self, resource):
+        # A streaming HTTP response (closed on cancel) or a future (cancelled).
+        with self.lock:
+            self.resources.append(resource)
+            if not self.cancelled.is_set():
+                return
+        release(resource)
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled.set()
+            resources, self.resources = self.resources, []
+        for r in resources:
+            try:
+                release(r)
+            except Exception:
+                pass
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise Cancelled()
+
+
+class Scheduler:
+    # Owns all inference work. Questions run one at a time on a single worker in
+    # submission order, from a bounded queue. Vision passes run on a separate small
+    # pool and are shared between callers asking about the same image.
+    def __init__(self, max_pending=MAX_PENDING, vision_workers=1):
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.vision_pool = ThreadPoolExecutor(max_workers=vision_workers, thread_name_prefix="vision")
+        self.vision_inflight = {}
+        self.current = None
+        self.lock = threading.Lock()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def submit(self, fn, *args):
+        job = Job(fn, args)
+        self.jobs.put_nowait(job)  # raises queue.Full when too many questions are waiting
+        return job
+
+    def pending(self):
+        return self.jobs.qsize() + (1 if self.current is not None else 0)
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            if job.cancelled.is_set():
+                continue
+            with self.lock:
+                self.current = job
+            try:
+                job.fn(job, *job.args)
+            except Cancelled:
+                pass
+            finally:
+                with self.lock:
+                    self.current = None
+
+    def vision(self, key, fn, *args):
+        with self.lock:
+            fut = self.vision_inflight.get(key)
+            if fut is not None and not fut.cancelled():
+                return fut
+            fut = self.vision_pool.submit(fn, *args)
+            self.vision_inflight[key] = fut
+        fut.add_done_callback(lambda f, key=key: self.vision_done(key, f))
+        return fut
+
+    def vision_done(self, key, fut):
+        with self.lock:
+            if self.vision_inflight.get(key) is fut:
+                del self.vision_inflight[key]
+
+    def cancel_vision(self, keep=()):
+        # Drop queued vision passes for images that are no longer current.
+        with self.lock:
+            for key, fut in list(self.vision_inflight.items()):
+                if key not in keep and fut.cancel():
+                    del self.vision_inflight[key]
+
+    def stop(self):
+        cancelled = 0
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job.cancel()
+                cancelled += 1
+        with self.lock:
+            current = self.current
+        if current is not None:
+            current.cancel()
+            cancelled += 1
+        return cancelled
+
+    def shutdown(self):
+        self.stop()
+        self.vision_pool.shutdown(wait=False, cancel_futures=True)
+        self.jobs.put(None)
@@ -0,0 +1,88 @@
+import json, os, threading, datetime
+from vision_cache import CACHE_DIR
+
+SESSION_DIR = os.path.join(CACHE_DIR, "sessions")
+
+
+class SessionStore:
+    # Append-only JSONL file per chat session. Each turn is written and flushed as
+    # soon as it completes; old sessions are read back a page at a time. The file is
+    # only created by the first append, so empty sessions leave nothing behind.
+    def __init__(self, directory=SESSION_DIR, session_id=None):
+        self.directory = directory
+        self.session_id = session_id or datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.path = os.path.join(directory, self.session_id + ".jsonl")
+        self.lock = threading.Lock()
+        self.offsets = self.scan() if os.path.exists(self.path) else []
+        self.file = None
+
+    def scan(self):
+        offsets, pos = [], 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.endswith(b"\n"):
+                    offsets.append(pos)
+                pos += len(line)
+        return offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def append(self, turn):
+        data = json.dumps(turn).encode() + b"\n"
+        with self.lock:
+            if self.file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self.file = open(self.path, "ab")
+            self.file.seek(0, os.SEEK_END)
+            self.offsets.append(self.file.tell())
+            self.file.write(data)
+            self.file.flush()
+
+    def page(self, start, count):
+        with self.lock:
+            offsets = self.offsets[start:start + count]
+        turns = []
+        if not offsets:
+            return turns
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                turns.append(json.loads(f.readline()))
+        return turns
+
+    def iter_turns(self):
+        with self.lock:
+            n = len(self.offsets)
+        if not n:
+            return
+        with open(self.path, "rb") as f:
+            for _ in range(n):
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                yield json.loads(line)
+
+    def export(self, dest, summary):
+        # Streams the session into the {"summary", "chat": [...]} export format
+        # without loading it into memory.
+        with self.lock:
+            n = len(self.offsets)
+        with open(dest, "w", encoding="utf-8") as out:
+            out.write('{"summary": ' + json.dumps(summary, indent=2) + ',\n"chat": [\n')
+            if n:
+                self.copy_turns(out, n)
+            out.write("\n]}\n")
+
+    def copy_turns(self, out, n):
+        with open(self.path, "rb") as src:
+            for i in range(n):
+                line = src.readline()
+                if not line.endswith(b"\n"):
+                    break
+                out.write((",\n" if i else "") + line.decode().rstrip("\n"))
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
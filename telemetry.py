@@ -0,0 +1,105 @@
+import threading, time
+from collections import deque
+
+EVENT_CAPACITY = 2000
+SAMPLE_CAPACITY = 3600  # one hour of 1 Hz NVML samples
+
+
+class RingBuffer:
+    def __init__(self, capacity):
+        self.items = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.version = 0
+
+    def append(self, item):
+        with self.lock:
+            self.items.append(item)
+            self.version += 1
+
+    def latest(self, n=None):
+        with self.lock:
+            if n is None or n >= len(self.items):
+                return list(self.items)
+            return [self.items[i] for i in range(len(self.items) - n, len(self.items))]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.version += 1
+
+
+class Telemetry:
+    # Fixed-size stores for log events and GPU samples. Safe to write from any thread;
+    # the UI reads snapshots on its own schedule.
+    def __init__(self, event_capacity=EVENT_CAPACITY, sample_capacity=SAMPLE_CAPACITY):
+        self.events = RingBuffer(event_capacity)
+        self.samples = RingBuffer(sample_capacity)
+
+    def event(self, text, key_event=False, **fields):
+        self.events.append({"t": time.time(), "text": text, "key_event": key_event, **fields})
+
+    def sample(self, gpu):
+        if gpu:
+            self.samples.append({"t": time.time(), **gpu})
+
+    def recent_events(self, n):
+        return self.events.latest(n)
+
+    def latest_sample(self):
+        last = self.samples.latest(1)
+        return last[0] if last else {}
+
+    def samples_between(self, start, end):
+        return [s for s in self.samples.latest() if start <= s["t"] <= end]
+
+
+def ns_to_s(value):
+    return round(value / 1e9, 4) if value else None
+
+
+class Span:
+    # Wall-clock timing for one model call, merged with the timing fields Ollama
+    # returns on its final response and the GPU samples taken while it ran.
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+        self.start = time.time()
+        self.t0 = time.perf_counter()
+        self.ttft = None
+        self.ttfa = None
+        self.ollama = {}
+        self.cached = False
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.t0
+        return self.ttft
+
+    def first_answer(self):
+        # Differs from first_token() when a reasoning model thinks first.
+        if self.ttfa is None:
+            self.ttfa = time.perf_counter() - self.t0
+        return self.ttfa
+
+    def set_ollama(self, data):
+        self.ollama = {k: data[k] for k in ("total_duration", "load_duration", "prompt_eval_count",
+                                            "prompt_eval_duration", "eval_count", "eval_duration")
+                       if k in data}
+
+    def finish(self, telemetry=None):
+        end = time.time()
+        o = self.ollama
+        span = {"name": self.name, "model": self.model, "cached": self.cached,
+                "start": round(self.start, 3), "wall_seconds": round(time.perf_counter() - self.t0, 4),
+                "ttft_seconds": round(self.ttft, 4) if self.ttft is not None else None,
+                "ttfa_seconds": round(self.ttfa, 4) if self.ttfa is not None else None,
+                "total_duration_s": ns_to_s(o.get("total_duration")),
+                "load_duration_s": ns_to_s(o.get("load_duration")),
+                "prompt_eval_count": o.get("prompt_eval_count"),
+                "prompt_eval_s": ns_to_s(o.get("prompt_eval_duration")),
+                "eval_count": o.get("eval_count"),
+                "eval_s": ns_to_s(o.get("eval_duration"))}
+        span["tokens_per_sec"] = (round(o["eval_count"] / (o["eval_duration"] / 1e9), 2)
+                                  if o.get("eval_count") and o.get("eval_duration") else None)
+        span["gpu_samples"] = telemetry.samples_between(self.start, end) if telemetry else []
+        return span
@@ -0,0 +1,73 @@
+import asyncio, os, sys, tempfile, unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from PIL import Image
+from mock_ollama import MockConfig, MockOllamaServer
+from inference_engine import InferenceEngine, AsyncOllamaClient
+from vision_cache import VisionCache
+from telemetry import Span
+
+
+class InferenceEngineTest(unittest.TestCase):
+    # Drives the engine against the mock Ollama server; no GPU or models needed.
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mock = MockOllamaServer(MockConfig(latency=0.01, tokens_per_sec=2000, reply_tokens=8,
+                                                think_tokens=4)).start()
+        self.cache = VisionCache(os.path.join(self.tmp.name, "cache.db"))
+        self.image = os.path.join(self.tmp.name, "photo.png")
+        Image.new("RGB", (64, 48), "red").save(self.image)
+
+    def tearDown(self):
+        self.cache.close()
+        self.mock.stop()
+        self.tmp.cleanup()
+
+    def run_engine(self, fn):
+        async def main():
+            engine = InferenceEngine(AsyncOllamaClient(self.mock.url, retries=0), self.cache)
+            try:
+                return await fn(engine)
+            finally:
+                await engine.client.close()
+        return asyncio.run(main())
+
+    def test_stream_splits_thinking_from_answer(self):
+        tokens, thoughts = [], []
+        span = Span("reasoning", "deepseek-r1:8b")
+        messages = [{"role": "user", "content": "hi"}]
+        thinking, answer = self.run_engine(
+            lambda e: e.chat("deepseek-r1:8b", messages, tokens.append, thoughts.append, span))
+        self.assertEqual("".join(thoughts), thinking)
+        self.assertEqual("".join(tokens), answer)
+        self.assertEqual(thinking.split(), ["hmm"] * 4)
+        self.assertEqual(answer.split(), ["tok"] * 8)
+        self.assertNotIn("<think>", answer)
+        self.assertIsNotNone(span.ttft)
+        self.assertGreaterEqual(span.ttfa, span.ttft)
+
+    def test_non_streaming_chat_splits_the_same_way(self):
+        messages = [{"role": "user", "content": "hi"}]
+        thinking, answer = self.run_engine(lambda e: e.chat("deepseek-r1:8b", messages, stream=False))
+        self.assertEqual(thinking.split(), ["hmm"] * 4)
+        self.assertEqual(answer.split(), ["tok"] * 8)
+
+    def test_concurrent_describes_share_one_vision_pass(self):
+        async def describe_twice(engine):
+            return await asyncio.gather(engine.describe(self.image), engine.describe(self.image))
+
+        (first, cached1), (second, cached2) = self.run_engine(describe_twice)
+        self.assertEqual(first, second)
+        self.assertEqual((cached1, cached2), (False, False))
+        self.assertEqual(self.mock.calls.get("/api/generate"), 1)
+
+        _, cached = self.run_engine(lambda e: e.describe(self.image))
+        self.assertTrue(cached)
+        self.assertEqual(self.mock.calls.get("/api/generate"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import base64, io, math
+from PIL import Image, ImageOps
+from image_pipeline import MAX_SIDE, JPEG_QUALITY
+
+TILE_MIN_SIDE = 1024   # don't tile below this many source pixels per tile
+MAX_GRID = 4           # at most 4x4 tiles
+OVERLAP = 0.15
+
+
+def tile_boxes(width, height, min_side=TILE_MIN_SIDE, max_grid=MAX_GRID, overlap=OVERLAP):
+    # Smallest tile side that covers the long edge in max_grid overlapping tiles.
+    side = max(min_side, math.ceil(max(width, height) / (max_grid - (max_grid - 1) * overlap)))
+    step = max(1, int(side * (1 - overlap)))
+
+    def starts(length):
+        if length <= side:
+            return [0]
+        n = min(max_grid, math.ceil((length - side) / step) + 1)
+        return [round(i * (length - side) / (n - 1)) for i in range(n)]
+
+    return [(x, y, min(x + side, width), min(y + side, height))
+            for y in starts(height) for x in starts(width)]
+
+
+def needs_tiling(width, height, min_side=TILE_MIN_SIDE):
+    return max(width, height) > 2 * min_side
+
+
+def image_size(path):
+    # Reads the header only; orientation doesn't matter to needs_tiling.
+    with Image.open(path) as img:
+        return img.size
+
+
+def make_tiles(path, max_side=MAX_SIDE, quality=JPEG_QUALITY):
+    # Returns (image size, [(box, base64 JPEG)]) with each tile scaled to the model's input size.
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        tiles = []
+        for box in tile_boxes(*img.size):
+            tile = img.crop(box)
+            tile.thumbnail((max_side, max_side), Image.LANCZOS)
+            buf = io.BytesIO()
+            tile.save(buf, format="JPEG", quality=quality)
+            tiles.append((box, base64.b64encode(buf.getvalue()).decode()))
+        return img.size, tiles
@@ -0,0 +1,314 @@
+import math, tkinter as tk
+from bisect import bisect_right
+from collections import OrderedDict
+import customtkinter as ctk
+from image_loader import ImageLoader, THUMB_SIZE
+
+USER_COLOR = "#1f6aa5"
+AI_COLOR = "#2b2b2b"
+THINK_COLOR = "#232323"
+THINK_TEXT = "gray60"
+WRAP = 620
+PAD_X, PAD_Y = 10, 6
+LABEL_PAD = 6
+OVERSCAN = 3
+THUMB_CACHE = 64
+
+
+class Entry:
+    __slots__ = ("sender", "text", "path", "size", "height", "collapsed")
+
+    def __init__(self, sender, text=None, path=None, size=None):
+        self.sender = sender
+        self.text = text
+        self.path = path
+        self.size = size
+        self.height = 0
+        self.collapsed = sender == "think"
+
+    def display(self):
+        # Collapsed reasoning shows a one-line header; the full trace is only laid
+        # out once the user expands it.
+        if self.sender != "think":
+            return self.text
+        if self.collapsed:
+            return f"\u25b8 Thinking ({len(self.text.split())} words) - click to expand"
+        return "\u25be Thinking - click to collapse\n\n" + self.text.strip()
+
+
+class TranscriptView(ctk.CTkFrame):
+    # Chat transcript that keeps messages as plain Entry records and only creates
+    # label widgets for the rows inside (or just around) the visible viewport.
+    # Off-screen labels are returned to a pool and reused for the next rows.
+    def __init__(self, master, loader=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.loader = loader or ImageLoader()
+        self.canvas = tk.Canvas(self, highlightthickness=0, bd=0,
+                                bg=self._apply_appearance_mode(self._fg_color))
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=10)
+        self.canvas.configure(yscrollcommand=self.on_yscroll)
+
+        self.font = ctk.CTkFont()
+        self.linespace = self.font.metrics("linespace")
+        self.entries = []
+        self.offsets = []
+        self.total = 0
+        self.epoch = 0   # bumped by clear() so stale indexes can be recognised
+        self.live = {}
+        self.text_pool = []
+        self.image_pool = []
+        self.thumbs = OrderedDict()
+        self.waiting = set()
+        self.refresh_pending = False
+
+        self.canvas.bind("<Configure>", lambda e: self.on_resize())
+        self.canvas.bind("<Enter>", lambda e: self.bind_wheel(True))
+        self.canvas.bind("<Leave>", lambda e: self.bind_wheel(False))
+
+    # ---------------- MODEL ----------------
+    def add(self, text, sender="ai"):
+        return self.append(Entry(sender, text=text))
+
+    def add_thinking(self, text=""):
+        return self.append(Entry("think", text=text))
+
+    def add_image(self, path, image=None, sender="user"):
+        if image is None:
+            decoded = self.loader.get(path)
+            image = decoded.thumb if decoded else None
+        if image is None:
+            # Placeholder until the background decode lands in thumb_ready().
+            index = self.append(Entry(sender, path=path, size=THUMB_SIZE))
+            self.request_thumb(path)
+            return index
+        self.cache_thumb(path, ctk.CTkImage(image, size=image.size))
+        return self.append(Entry(sender, path=path, size=image.size))
+
+    def set_text(self, index, text, epoch=None):
+        if index >= len(self.entries) or epoch not in (None, self.epoch):
+            return  # transcript was cleared while a reply was streaming
+        entry = self.entries[index]
+        entry.text = text
+        self.redraw(index)
+
+    def toggle(self, index):
+        entry = self.entries[index]
+        if entry.sender == "think":
+            entry.collapsed = not entry.collapsed
+            self.redraw(index, follow=False)
+
+    def redraw(self, index, follow=None):
+        entry = self.entries[index]
+        follow = self.at_bottom() if follow is None else follow
+        if index in self.live:
+            self.live[index][0].configure(text=entry.display())
+        self.resize_entry(index, self.estimate(entry))
+        if follow:
+            self.canvas.yview_moveto(1.0)
+
+    def clear(self):
+        for index in list(self.live):
+            self.release(index)
+        self.epoch += 1
+        self.entries.clear()
+        self.offsets.clear()
+        self.total = 0
+        self.thumbs.clear()
+        self.update_region()
+
+    def append(self, entry):
+        follow = self.at_bottom()
+        entry.height = self.estimate(entry)
+        self.entries.append(entry)
+        self.offsets.append(self.total)
+        self.total += entry.height
+        self.update_region()
+        if follow:
+            self.canvas.yview_moveto(1.0)
+        self.schedule_refresh()
+        return len(self.entries) - 1
+
+    # ---------------- LAYOUT ----------------
+    def estimate(self, entry):
+        if entry.path is not None:
+            return entry.size[1] + 2 * PAD_Y
+        lines = 0
+        for para in entry.display().split("\n"):
+            lines += max(1, math.ceil(self.font.measure(para) / WRAP)) if para else 1
+        return lines * self.linespace + 2 * LABEL_PAD + 2 * PAD_Y
+
+    def resize_entry(self, index, height):
+        delta = height - self.entries[index].height
+        if abs(delta) < 2:
+            return
+        self.entries[index].height = height
+        for i in range(index + 1, len(self.offsets)):
+            self.offsets[i] += delta
+        self.total += delta
+        for i, (widget, item, pool) in self.live.items():
+            if i > index:
+                self.canvas.coords(item, self.x_for(self.entries[i]), self.offsets[i] + PAD_Y)
+        self.update_region()
+        self.schedule_refresh()
+
+    def x_for(self, entry):
+        return self.canvas.winfo_width() - PAD_X if entry.sender == "user" else PAD_X
+
+    def update_region(self):
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), max(self.total, 1)))
+
+    def at_bottom(self):
+        return self.canvas.yview()[1] >= 0.999
+
+    def on_resize(self):
+        self.update_region()
+        for i, (widget, item, pool) in self.live.items():
+            self.canvas.coords(item, self.x_for(self.entries[i]), self.offsets[i] + PAD_Y)
+        self.schedule_refresh()
+
+    # ---------------- SCROLLING ----------------
+    def yview(self, *args):
+        self.canvas.yview(*args)
+
+    def on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.schedule_refresh()
+
+    def bind_wheel(self, active):
+        if active:
+            self.canvas.bind_all("<MouseWheel>", self.on_wheel)
+            self.canvas.bind_all("<Button-4>", lambda e: self.canvas.yview_scroll(-3, "units"))
+            self.canvas.bind_all("<Button-5>", lambda e: self.canvas.yview_scroll(3, "units"))
+        else:
+            for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                self.canvas.unbind_all(seq)
+
+    def on_wheel(self, event):
+        step = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        self.canvas.yview_scroll(int(step) * 3, "units")
+
+    # ---------------- VIRTUALIZATION ----------------
+    def schedule_refresh(self):
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.after_idle(self.refresh)
+
+    def refresh(self):
+        self.refresh_pending = False
+        if not self.entries:
+            return
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first = max(0, bisect_right(self.offsets, top) - 1 - OVERSCAN)
+        last = min(len(self.entries), bisect_right(self.offsets, bottom) + OVERSCAN)
+        for index in [i for i in self.live if not first <= i < last]:
+            self.release(index)
+        for index in range(first, last):
+            if index not in self.live:
+                self.materialize(index)
+        self.after_idle(self.measure_live)
+
+    def materialize(self, index):
+        entry = self.entries[index]
+        photo = self.get_thumb(entry.path) if entry.path is not None else None
+        if photo is not None:
+            pool = self.image_pool
+            widget = pool.pop() if pool else ctk.CTkLabel(self.canvas, text="")
+            widget.configure(image=photo)
+            widget.image = photo
+        else:
+            pool = self.text_pool
+            if pool:
+                widget = pool.pop()
+            else:
+                widget = ctk.CTkLabel(self.canvas, corner_radius=15, wraplength=WRAP, justify="left")
+                widget.bind("<Button-1>", lambda e, w=widget: self.on_click(w))
+            think = entry.sender == "think"
+            widget.configure(text=entry.display() if entry.path is None else "Loading preview...",
+                             fg_color=USER_COLOR if entry.sender == "user" else
+                             THINK_COLOR if think else AI_COLOR,
+                             text_color=THINK_TEXT if think else ctk.ThemeManager.theme["CTkLabel"]["text_color"],
+                             cursor="hand2" if think else "")
+        anchor = "ne" if entry.sender == "user" else "nw"
+        item = self.canvas.create_window(self.x_for(entry), self.offsets[index] + PAD_Y,
+                                         window=widget, anchor=anchor)
+        self.live[index] = (widget, item, pool)
+
+    def on_click(self, widget):
+        for index, (w, item, pool) in self.live.items():
+            if w is widget:
+                self.toggle(index)
+                return
+
+    def release(self, index):
+        widget, item, pool = self.live.pop(index)
+        self.canvas.delete(item)
+        pool.append(widget)
+
+    def measure_live(self):
+        # Replace estimated heights with real ones once Tk has laid the labels out.
+        for index in sorted(self.live):
+            widget = self.live[index][0]
+            real = widget.winfo_reqheight() + 2 * PAD_Y
+            if real > 2 * PAD_Y:
+                self.resize_entry(index, real)
+
+    # ---------------- THUMBNAILS ----------------
+    def cache_thumb(self, path, photo):
+        self.thumbs[path] = photo
+        self.thumbs.move_to_end(path)
+        while len(self.thumbs) > THUMB_CACHE:
+            self.thumbs.popitem(last=False)
+
+    def get_thumb(self, path):
+        # Never decodes on the Tk thread: a miss in both caches queues a background
+        # load and returns None so a placeholder is shown meanwhile.
+        photo = self.thumbs.get(path)
+        if photo is None:
+            decoded = self.loader.get(path)
+            if decoded is None:
+                self.request_thumb(path)
+                return None
+            photo = ctk.CTkImage(decoded.thumb, size=decoded.thumb.size)
+        self.cache_thumb(path, photo)
+        return photo
+
+    def request_thumb(self, path):
+        if path in self.waiting:
+            return
+        self.waiting.add(path)
+        try:
+            fut = self.loader.load(path)
+        except OSError as e:
+            self.thumb_ready(path, error=e)
+            return
+        fut.add_done_callback(lambda f: self.after(0, self.thumb_ready, path, f))
+
+    def thumb_ready(self, path, fut=None, error=None):
+        self.waiting.discard(path)
+        decoded = None
+        if error is None:
+            try:
+                decoded = fut.result()
+            except Exception as e:
+                error = e
+        if decoded is not None:
+            self.cache_thumb(path, ctk.CTkImage(decoded.thumb, size=decoded.thumb.size))
+        for index, entry in enumerate(self.entries):
+            if entry.path != path:
+                continue
+            if decoded is None:
+                entry.path, entry.text = None, f"Preview unavailable:\n{path}"
+            else:
+                entry.size = decoded.thumb.size
+            if index in self.live:
+                self.release(index)
+            self.resize_entry(index, self.estimate(entry))
+        self.schedule_refresh()
+
+    def _set_appearance_mode(self, mode_string):
+        super()._set_appearance_mode(mode_string)
+        if hasattr(self, "canvas"):
+            self.canvas.configure(bg=self._apply_appearance_mode(self._fg_color))
@@ -0,0 +1,73 @@
+import sqlite3, hashlib, threading, time, os
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".vision_chatbot")
+CACHE_DB = os.path.join(CACHE_DIR, "cache.db")
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_key(*parts):
+    return hashlib.sha256("\x00".join(str(p) for p in parts).encode()).hexdigest()
+
+
+class VisionCache:
+    # SQLite-backed key/value store with LRU eviction by entry count and total size.
+    def __init__(self, path=CACHE_DB, table="vision", max_entries=2000, max_bytes=64 * 1024**2):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.table = table
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                        "(key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_used REAL)")
+        self.db.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table}(last_used)")
+        self.db.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute(f"SELECT value FROM {self.table} WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute(f"UPDATE {self.table} SET last_used=? WHERE key=?", (time.time(), key))
+            self.db.commit()
+            return row[0]
+
+    def put(self, key, value):
+        size = len(value)
+        with self.lock:
+            self.db.execute(f"INSERT OR REPLACE INTO {self.table} VALUES (?,?,?,?)",
+                            (key, value, size, time.time()))
+            self.evict()
+            self.db.commit()
+
+    def evict(self):
+        count, total = self.db.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size),0) FROM {self.table}").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self.db.execute(f"SELECT key, size FROM {self.table} ORDER BY last_used").fetchall()
+        stale = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        self.db.executemany(f"DELETE FROM {self.table} WHERE key=?", stale)
+
+    def clear(self):
+        with self.lock:
+            self.db.execute(f"DELETE FROM {self.table}")
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
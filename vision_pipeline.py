@@ -0,0 +1,85 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from image_pipeline import encode_image
+from vision_cache import hash_file, make_key
+
+VISION_MODEL = "llava"
+VISION_PROMPT = "Describe objects, text, risks, layout and anomalies."
+TILE_PROMPT = ("This is one section of a larger image. Describe objects, small text, "
+               "defects and anomalies visible in this section only.")
+TILE_WORKERS = 2
+
+
+def call_ollama(client, model, prompt, images=None, span=None, **extra):
+    data = client.generate(model, prompt, images, **extra)
+    if span is not None:
+        span.set_ollama(data)
+    return data.get("response", "")
+
+
+def build_prompt(vision, question):
+    return f"Image:\n{vision}\n\nUser:\n{question}"
+
+
+def describe_image(client, path, vision_cache=None, image_cache=None, digest=None, span=None,
+                   loader=None, **extra):
+    # Returns (description, from_cache).
+    digest = digest or hash_file(path)
+    key = make_key(digest, VISION_MODEL, VISION_PROMPT)
+    if vision_cache is not None:
+        cached = vision_cache.get(key)
+        if cached is not None:
+            return cached, True
+    vision = call_ollama(client, VISION_MODEL, VISION_PROMPT,
+                         [encode_image(path, image_cache, digest, loader=loader)], span, **extra)
+    if vision and vision_cache is not None:
+        vision_cache.put(key, vision)
+    return vision, False
+
+
+def describe_tiled(client, path, vision_cache=None, image_cache=None, digest=None, span=None,
+                   workers=TILE_WORKERS, loader=None, **extra):
+    # Overview of the whole image plus one description per overlapping tile, merged
+    # into a single context. Tiles are cached by their own content, so an edited
+    # image only re-runs the tiles that changed.
+    from tiling import image_size, make_tiles, needs_tiling
+    digest = digest or hash_file(path)
+    key = make_key(digest, VISION_MODEL, "tiled", TILE_PROMPT)
+    if vision_cache is not None:
+        cached = vision_cache.get(key)
+        if cached is not None:
+            return cached, True
+    overview, _ = describe_image(client, path, vision_cache, image_cache, digest, span, loader,
+                                 **extra)
+    if not needs_tiling(*image_size(path)):
+        return overview, False
+    size, tiles = make_tiles(path)
+    if len(tiles) == 1:
+        return overview, False
+
+    def describe_tile(tile):
+        box, b64 = tile
+        tile_key = make_key(hashlib.sha256(b64.encode()).hexdigest(), VISION_MODEL, TILE_PROMPT)
+        text = vision_cache.get(tile_key) if vision_cache is not None else None
+        if text is None:
+            text = call_ollama(client, VISION_MODEL, TILE_PROMPT, [b64], **extra)
+            if text and vision_cache is not None:
+                vision_cache.put(tile_key, text)
+        return box, text
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        regions = list(pool.map(describe_tile, tiles))
+    merged = merge_tiles(size, overview, regions)
+    if vision_cache is not None:
+        vision_cache.put(key, merged)
+    return merged, False
+
+
+def merge_tiles(size, overview, regions):
+    w, h = size
+    parts = [f"Overview ({w}x{h} px):\n{overview.strip()}", "", "Details by region:"]
+    for (x0, y0, x1, y1), text in regions:
+        col = "left" if x1 <= w * 0.4 else "right" if x0 >= w * 0.6 else "center"
+        row = "top" if y1 <= h * 0.4 else "bottom" if y0 >= h * 0.6 else "middle"
+        parts.append(f"- {row}-{col} [x {x0}-{x1}, y {y0}-{y1}]: {text.strip()}")
+    return "\n".join(parts)
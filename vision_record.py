@@ -0,0 +1,63 @@
+import json, re
+
+STRUCTURED_PROMPT = (
+    "Analyze the image. Reply with JSON only, using exactly these keys: "
+    '{"objects": [short noun phrases], "text": [every piece of visible text, verbatim], '
+    '"risks": [safety or security risks], "layout": "one sentence on the arrangement", '
+    '"anomalies": [anything unusual, damaged or out of place]}. Use [] when nothing applies.'
+)
+FIELDS = ("objects", "text", "risks", "layout", "anomalies")
+BASE_FIELDS = ("objects", "layout", "description")  # always in the system message
+KEYWORDS = {
+    "text": r"\b(text|read|say|says|written|writing|label|sign|word|number|ocr|caption|title)",
+    "risks": r"\b(risk|safe|safety|hazard|danger|unsafe|injur|secur|ppe|fire)",
+    "anomalies": r"\b(anomal|defect|damage|broken|wrong|unusual|odd|crack|leak|missing|fault)",
+    "layout": r"\b(where|left|right|top|bottom|behind|front|next to|layout|position|arrange)",
+}
+
+
+def parse_record(raw):
+    try:
+        data = json.loads(raw)
+    except (ValueError, TypeError):
+        return {"objects": [], "text": [], "risks": [], "layout": "", "anomalies": [],
+                "description": (raw or "").strip()}
+    if not isinstance(data, dict):
+        data = {}
+    record = {}
+    for field in FIELDS:
+        value = data.get(field, "" if field == "layout" else [])
+        if field == "layout":
+            record[field] = value if isinstance(value, str) else " ".join(map(str, value or []))
+        else:
+            items = value if isinstance(value, list) else [value] if value else []
+            record[field] = [str(v).strip() for v in items if str(v).strip()]
+    return record
+
+
+def pack(record):
+    # Drop empty fields and whitespace so the cached record stays small.
+    return json.dumps({k: v for k, v in record.items() if v}, separators=(",", ":"))
+
+
+def unpack(packed):
+    return json.loads(packed)
+
+
+def relevant_fields(question):
+    q = question.lower()
+    hits = [field for field, pattern in KEYWORDS.items() if re.search(pattern, q)]
+    if hits:
+        return [f for f in hits if f not in BASE_FIELDS]
+    # An open-ended question gets everything.
+    return [f for f in FIELDS if f not in BASE_FIELDS]
+
+
+def render(record, fields):
+    lines = []
+    for field in fields:
+        value = record.get(field)
+        if not value:
+            continue
+        lines.append(f"{field}: {value if isinstance(value, str) else '; '.join(value)}")
+    return "\n".join(lines)